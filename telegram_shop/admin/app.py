@@ -3,24 +3,27 @@ from flask_login import LoginManager, UserMixin, login_user, logout_user, login_
 import sqlite3
 import os
 import sys
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import html
 
 # Добавляем путь к корневой папке проекта
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import ADMIN_ID, DATABASE_URL
+from config import ADMIN_ID, DATABASE_URL, ADMIN_ORDERS_PAGE_SIZE, ADMIN_DB_POOL_SIZE
 from database.models import Base
-from sqlalchemy import create_engine, text
+from database import queries
+from database.order_stats import summarize
+from database.order_status import change_status
+from database.storage import build_sync_engine
+from sqlalchemy import text
 from sqlalchemy.orm import sessionmaker
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'  # Замените на случайный ключ
 
-# Настройка базы данных
-db_path = DATABASE_URL.replace('sqlite+aiosqlite:///', '')
-engine = create_engine(f'sqlite:///{db_path}')
+# Настройка базы данных: пул по числу потоков сервера, PRAGMA профиля хранилища (WAL, busy_timeout)
+engine = build_sync_engine(pool_size=ADMIN_DB_POOL_SIZE)
 SessionLocal = sessionmaker(bind=engine)
 
 # Настройка Flask-Login
@@ -109,61 +112,125 @@ def logout():
 def index():
     return redirect(url_for('orders'))
 
+# Список заказов: постранично по ключу (created_at, id), новые сверху
+ORDER_STATUSES = ('pending', 'confirmed', 'completed', 'cancelled')
+CURSOR_SEPARATOR = '|'
+
+def parse_order_filters(args):
+    """Фильтры списка заказов из query string; ValueError - некорректная дата или статус"""
+    filters = {
+        'status': args.get('status', '').strip(),
+        'date_from': args.get('date_from', '').strip(),
+        'date_to': args.get('date_to', '').strip(),
+        'customer': args.get('customer', '').strip(),
+    }
+    if filters['status'] and filters['status'] not in ORDER_STATUSES:
+        raise ValueError(f"Неизвестный статус: {filters['status']}")
+    for field in ('date_from', 'date_to'):
+        if filters[field]:
+            datetime.strptime(filters[field], '%Y-%m-%d')
+    return filters
+
+def encode_cursor(order):
+    return f"{order.created_at}{CURSOR_SEPARATOR}{order.id}"
+
+def decode_cursor(cursor):
+    """Ключ последнего показанного заказа; ValueError - курсор поврежден"""
+    created_at, _, order_id = cursor.rpartition(CURSOR_SEPARATOR)
+    if not created_at:
+        raise ValueError("Некорректный курсор")
+    return created_at, int(order_id)
+
+def fetch_orders_page(session, filters, cursor=None, limit=ADMIN_ORDERS_PAGE_SIZE):
+    """Страница заказов и курсор следующей (None - это последняя)"""
+    after = decode_cursor(cursor) if cursor else None
+    # Лишняя строка показывает, есть ли следующая страница
+    statement, params = queries.admin_orders_page(filters, after, limit + 1)
+    rows = session.execute(statement, params).fetchall()
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+def order_to_dict(order):
+    return {
+        'id': order.id,
+        'status': order.status,
+        'total_amount': order.total_amount,
+        'created_at': str(order.created_at),
+        'customer_name': order.customer_name,
+        'username': order.username,
+        'first_name': order.first_name,
+        'last_name': order.last_name,
+        'telegram_id': order.telegram_id,
+    }
+
 @app.route('/orders')
 @login_required
 def orders():
     session = SessionLocal()
     try:
-        # Получаем заказы с информацией о пользователях
-        orders_data = session.execute(text("""
-            SELECT o.*, u.username, u.first_name, u.last_name, u.telegram_id
-            FROM orders o
-            LEFT JOIN users u ON o.user_id = u.id
-            ORDER BY o.created_at DESC
-        """)).fetchall()
+        try:
+            filters = parse_order_filters(request.args)
+        except ValueError as e:
+            flash(f'❌ {e}', 'error')
+            filters = parse_order_filters({})
         
-        # Получаем статистику
-        stats = session.execute(text("""
-            SELECT
-                COUNT(*) as total_orders,
-                SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END) as pending_orders,
-                SUM(CASE WHEN status = 'confirmed' THEN 1 ELSE 0 END) as confirmed_orders,
-                SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) as completed_orders,
-                SUM(total_amount) as total_revenue
-            FROM orders
-            WHERE status != 'cancelled'
-        """)).fetchone()
+        # Первая страница заказов с информацией о пользователях
+        orders_data, next_cursor = fetch_orders_page(session, filters)
+        
+        # Статистика из сводки, которую ведут триггеры на orders, - по строке на статус
+        stats = summarize(session.execute(
+            text("SELECT status, orders, revenue FROM order_stats_total")
+        ).fetchall())
         
         return render_template('orders.html',
                              orders=orders_data,
+                             next_cursor=next_cursor,
+                             filters=filters,
+                             statuses=ORDER_STATUSES,
                              stats=stats,
                              current_time=datetime.now())
     finally:
         session.close()
 
+@app.route('/api/orders')
+@login_required
+def orders_page():
+    """Следующая страница заказов для кнопки "Показать еще" (фильтры те же, что у /orders)"""
+    session = SessionLocal()
+    try:
+        try:
+            filters = parse_order_filters(request.args)
+            orders_data, next_cursor = fetch_orders_page(session, filters, request.args.get('cursor'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'orders': [order_to_dict(order) for order in orders_data],
+            'html': render_template('_order_rows.html', orders=orders_data),
+            'next_cursor': next_cursor,
+        })
+    finally:
+        session.close()
+
 @app.route('/database')
 @login_required
 def database():
     session = SessionLocal()
     try:
-        # Получаем статистику по всем таблицам
-        tables = ['products', 'categories', 'brands', 'users', 'orders', 'order_items']
-        stats = {}
+        # Число строк из счетчиков, которые ведут триггеры, вместо COUNT(*) по каждой таблице
+        stats = dict(session.execute(text("SELECT table_name, row_count FROM table_counters")).fetchall())
         
-        for table in tables:
-            count = session.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
-            stats[table] = count
+        # Последние 10 товаров - по индексу ix_products_created_at
+        products = session.execute(queries.ADMIN_LATEST_PRODUCTS).fetchall()
         
-        # Последние 10 товаров
-        products = session.execute(text("""
-            SELECT p.*, c.name as category_name, b.name as brand_name
-            FROM products p
-            LEFT JOIN categories c ON p.category_id = c.id
-            LEFT JOIN brands b ON p.brand_id = b.id
-            ORDER BY p.created_at DESC LIMIT 10
-        """)).fetchall()
-        
-        return render_template('database.html', stats=stats, products=products)
+        return render_template('database.html',
+                             stats=stats,
+                             products=products,
+                             DATABASE_URL=DATABASE_URL,
+                             current_time=datetime.now())
     finally:
         session.close()
 
@@ -215,48 +282,21 @@ def brands():
 @app.route('/api/update_order_status', methods=['POST'])
 @login_required
 def update_order_status():
+    """Смена статуса одного заказа; повтор того же статуса ничего не меняет"""
     data = request.json
     order_id = data.get('order_id')
     new_status = data.get('status')
     
     session = SessionLocal()
     try:
-        # Обновляем статус заказа
-        session.execute(
-            text("UPDATE orders SET status = :status WHERE id = :id"),
-            {"status": new_status, "id": order_id}
-        )
-        
-        # Если статус "completed" или "cancelled", обновляем количество товаров
-        if new_status in ['completed', 'cancelled']:
-            order_items = session.execute(
-                text("SELECT product_id, quantity FROM order_items WHERE order_id = :order_id"),
-                {"order_id": order_id}
-            ).fetchall()
-            
-            for item in order_items:
-                if new_status == 'completed':
-                    # Списание товара - просто уменьшаем quantity
-                    session.execute(
-                        text("""
-                            UPDATE products 
-                            SET quantity = quantity - :quantity 
-                            WHERE id = :product_id
-                        """),
-                        {"quantity": item.quantity, "product_id": item.product_id}
-                    )
-                elif new_status == 'cancelled':
-                    # Возврат товара - увеличиваем quantity обратно
-                    session.execute(
-                        text("""
-                            UPDATE products 
-                            SET quantity = quantity + :quantity 
-                            WHERE id = :product_id
-                        """),
-                        {"quantity": item.quantity, "product_id": item.product_id}
-                    )
-        
+        # Остатки поправляются по переходу из текущего статуса: см. database.order_status
+        result = change_status(session, [order_id], new_status)
         session.commit()
+        
+        if result['missing']:
+            return jsonify({'success': False, 'message': 'Заказ не найден'})
+        if result['rejected']:
+            return jsonify({'success': False, 'message': 'Этот переход статуса недоступен'})
         return jsonify({'success': True, 'message': 'Статус заказа обновлен'})
     except Exception as e:
         session.rollback()
@@ -264,6 +304,35 @@ def update_order_status():
     finally:
         session.close()
 
+@app.route('/api/bulk_update_order_status', methods=['POST'])
+@login_required
+def bulk_update_order_status():
+    """Смена статуса выбранных заказов одной транзакцией"""
+    data = request.json or {}
+    order_ids = data.get('order_ids') or []
+    new_status = data.get('status')
+    
+    session = SessionLocal()
+    try:
+        try:
+            result = change_status(session, order_ids, new_status)
+        except (TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': str(e)}), 400
+        session.commit()
+        
+        skipped = len(result['rejected']) + len(result['missing'])
+        message = f"Обновлено заказов: {len(result['changed'])}"
+        if result['unchanged']:
+            message += f", уже в этом статусе: {len(result['unchanged'])}"
+        if skipped:
+            message += f", пропущено: {skipped}"
+        return jsonify({'success': True, 'message': message, **result})
+    except Exception as e:
+        session.rollback()
+        return jsonify({'success': False, 'message': str(e)})
+    finally:
+        session.close()
+
 @app.route('/api/order_details/<int:order_id>')
 @login_required
 def order_details(order_id):
@@ -285,15 +354,7 @@ def order_details(order_id):
             return jsonify({'error': 'Заказ не найден'})
         
         # Получаем товары в заказе
-        order_items = session.execute(
-            text("""
-                SELECT oi.*, p.name as product_name, p.price as current_price
-                FROM order_items oi
-                LEFT JOIN products p ON oi.product_id = p.id
-                WHERE oi.order_id = :order_id
-            """),
-            {"order_id": order_id}
-        ).fetchall()
+        order_items = session.execute(queries.ADMIN_ORDER_ITEMS, {"order_id": order_id}).fetchall()
         
         # Формируем HTML для модального окна
         html_content = f"""
@@ -404,8 +465,8 @@ def add_product():
     try:
         session.execute(
             text("""
-                INSERT INTO products (name, description, price, quantity, category_id, brand_id, is_active)
-                VALUES (:name, :description, :price, :quantity, :category_id, :brand_id, 1)
+                INSERT INTO products (name, description, price, quantity, category_id, brand_id, is_active, created_at)
+                VALUES (:name, :description, :price, :quantity, :category_id, :brand_id, 1, CURRENT_TIMESTAMP)
             """),
             {
                 "name": data['name'],
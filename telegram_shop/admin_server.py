@@ -2,10 +2,16 @@
 """
 Сервер админ-панели для Telegram магазина
 Запуск: python admin_server.py
+
+Режим выбирается ADMIN_SERVER в config.py:
+  threaded - Werkzeug без отладчика, запросы обрабатывает пул из ADMIN_THREADS потоков
+  waitress - production WSGI сервер waitress (pip install waitress), без него - threaded
+  dev      - отладочный сервер Flask с перезагрузкой, только для разработки
 """
 
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Загружаем переменные окружения
@@ -15,29 +21,79 @@ load_dotenv()
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
-from admin.app import app
-from config import ADMIN_HOST, ADMIN_PORT, ADMIN_SECRET_KEY
+from werkzeug.serving import BaseWSGIServer
+
+from admin.app import app, engine
+from database.migrations import migrate_sync_engine
+from config import ADMIN_HOST, ADMIN_PORT, ADMIN_SECRET_KEY, ADMIN_SERVER, ADMIN_THREADS
+
+class PooledWSGIServer(BaseWSGIServer):
+    """WSGI сервер Werkzeug с фиксированным пулом потоков
+
+    Медленный запрос занимает один поток, остальные продолжают обслуживаться.
+    Потоков не больше, чем соединений в пуле базы, поэтому запросы не ждут соединение.
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, wsgi_app, threads):
+        super().__init__(host, port, wsgi_app)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="admin")
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def serve_threaded(host, port, threads):
+    server = PooledWSGIServer(host, port, app, threads)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+def serve_waitress(host, port, threads):
+    try:
+        from waitress import serve
+    except ImportError:
+        print("⚠️ waitress не установлен (pip install waitress), запускаю threaded")
+        return serve_threaded(host, port, threads)
+    serve(app, host=host, port=port, threads=threads)
 
 def main():
     """Запуск сервера админ-панели"""
-    print("🚀 Запуск админ-панели...")
+    print(f"🚀 Запуск админ-панели ({ADMIN_SERVER}, потоков: {ADMIN_THREADS})...")
     print(f"📊 Админ-панель доступна по адресу: http://{ADMIN_HOST}:{ADMIN_PORT}")
     print(f"🔐 ADMIN_ID из .env: {os.getenv('ADMIN_ID')}")
     print("⏹️  Для остановки нажмите Ctrl+C")
-    
+
     # Устанавливаем секретный ключ из конфига
     app.secret_key = ADMIN_SECRET_KEY
-    
+
+    # Доводим схему базы до актуальной версии
+    migrate_sync_engine(engine)
+
     try:
-        app.run(
-            host=ADMIN_HOST,
-            port=ADMIN_PORT,
-            debug=True
-        )
+        if ADMIN_SERVER == "dev":
+            app.run(host=ADMIN_HOST, port=ADMIN_PORT, debug=True)
+        elif ADMIN_SERVER == "waitress":
+            serve_waitress(ADMIN_HOST, ADMIN_PORT, ADMIN_THREADS)
+        else:
+            serve_threaded(ADMIN_HOST, ADMIN_PORT, ADMIN_THREADS)
     except KeyboardInterrupt:
         print("\n🛑 Админ-панель остановлена")
     except Exception as e:
         print(f"❌ Ошибка при запуске админ-панели: {e}")
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1 @@
+# Бенчмарки и нагрузочные сценарии. Запуск из папки telegram_shop: python -m benchmarks.<имя>
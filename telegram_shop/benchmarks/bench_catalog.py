@@ -0,0 +1,91 @@
+"""
+Снимок каталога в памяти против запросов к базе на каждое нажатие
+Строит снимок для каталога заданного размера, сверяет ответы с SQL и меряет
+время построения, занятую память и время ответа обработчиков каталога.
+Запуск: python -m benchmarks.bench_catalog [--brands 100] [--per-brand 50] [--calls 2000]
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from benchmarks.common import temp_database_url, seed_catalog
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from database import queries
+from database.catalog import CatalogStore
+from database.dto import BrandRow, ProductRow
+from database.engine import build_engine
+from database.repository import ProductRepository
+
+async def database_us(calls: int, read) -> float:
+    started = time.perf_counter()
+    for i in range(calls):
+        await read(i)
+    return (time.perf_counter() - started) / calls * 1e6
+
+def snapshot_us(calls: int, read) -> float:
+    started = time.perf_counter()
+    for i in range(calls):
+        read(i)
+    return (time.perf_counter() - started) / calls * 1e6
+
+async def run(brands: int, per_brand: int, calls: int):
+    engine = build_engine(temp_database_url("catalog.db"))
+    await seed_catalog(engine, categories=10, brands=brands, products_per_brand=per_brand)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    store = CatalogStore(max_age=3600)
+
+    async with sessionmaker() as session:
+        tracemalloc.start()
+        await store.refresh(session)
+        snapshot_kb = tracemalloc.get_traced_memory()[0] / 1024
+        tracemalloc.stop()
+        await store.refresh(session, force=True)
+        catalog = store.snapshot
+        print(f"📚 {len(catalog)} товаров: построение {store.build_time * 1000:.1f} мс, ~{snapshot_kb:.0f} КБ")
+
+        # Снимок должен отвечать так же, как запросы, которые он заменил
+        for category in catalog.categories:
+            rows = await session.execute(queries.BRANDS_IN_CATEGORY, {"category_id": category.id})
+            assert set(catalog.get_brands(category.id)) == {BrandRow(*row) for row in rows}
+        for brand_id in range(1, brands + 1):
+            rows = await session.execute(queries.PRODUCTS_IN_STOCK_BY_BRAND, {"brand_id": brand_id})
+            assert catalog.get_products(brand_id) == tuple(ProductRow(*row) for row in rows)
+        for product_id in (1, len(catalog) // 2, len(catalog)):
+            assert catalog.get_product(product_id) == await ProductRepository.get_product_detail(session, product_id)
+        print("✅ Ответы снимка совпадают с запросами к базе")
+
+        product_count = len(catalog)
+
+        async def brands_query(i):
+            return (await session.execute(queries.BRANDS_IN_CATEGORY, {"category_id": i % 10 + 1})).all()
+
+        async def products_query(i):
+            return (await session.execute(queries.PRODUCTS_IN_STOCK_BY_BRAND, {"brand_id": i % brands + 1})).all()
+
+        async def detail_query(i):
+            return await ProductRepository.get_product_detail(session, i % product_count + 1)
+
+        cases = {
+            "brands": (brands_query, lambda i: catalog.get_brands(i % 10 + 1)),
+            "products": (products_query, lambda i: catalog.get_products(i % brands + 1)),
+            "product_detail": (detail_query, lambda i: catalog.get_product(i % product_count + 1)),
+        }
+
+        print(f"{'ответ':<16}{'база, мкс':>12}{'снимок, мкс':>14}")
+        for name, (database_read, snapshot_read) in cases.items():
+            print(f"{name:<16}{await database_us(calls, database_read):>12.1f}"
+                  f"{snapshot_us(calls * 10, snapshot_read):>14.2f}")
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--brands", type=int, default=100)
+    parser.add_argument("--per-brand", type=int, default=50)
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(run(args.brands, args.per_brand, args.calls))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Латентность оформления заказа в зависимости от размера корзины и под конкурентной нагрузкой
+Сравнивает построчный checkout (как было в confirm_order) и набором (OrderRepository.create_order_from_cart)
+Запуск: python -m benchmarks.bench_checkout [--repeat 20] [--concurrent 20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.common import temp_database_url, seed_catalog
+from sqlalchemy import event, insert, select, delete
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import selectinload
+
+from database.engine import build_engine
+from database.models import CartItem, Order, OrderItem, Product
+from database.repository import OrderRepository
+
+ORDER_DATA = {
+    "customer_name": "Клиент",
+    "delivery_method": "pickup",
+    "delivery_address": "3-е общежитие ВГТУ",
+    "delivery_date": "01.01.2030",
+    "delivery_time": "16:00-18:00",
+    "payment_method": "cash",
+}
+
+async def legacy_checkout(session, user_id: int):
+    """Построчное оформление, как в confirm_order до перехода на набор"""
+    result = await session.execute(
+        select(CartItem).options(selectinload(CartItem.product)).where(CartItem.user_id == user_id)
+    )
+    cart_items = result.scalars().all()
+    order = Order(user_id=user_id, total_amount=sum(i.product.price * i.quantity for i in cart_items),
+                  status="pending", **ORDER_DATA)
+    session.add(order)
+    await session.flush()
+    for cart_item in cart_items:
+        session.add(OrderItem(order_id=order.id, product_id=cart_item.product.id,
+                              product_name=cart_item.product.name,
+                              product_price=cart_item.product.price, quantity=cart_item.quantity))
+        product = await session.get(Product, cart_item.product.id)
+        product.quantity = max(0, product.quantity - cart_item.quantity)
+    for cart_item in cart_items:
+        await session.delete(cart_item)
+    await session.commit()
+
+async def set_based_checkout(session, user_id: int):
+    await OrderRepository.create_order_from_cart(session, user_id, ORDER_DATA)
+
+async def fill_cart(sessionmaker, user_id: int, size: int):
+    async with sessionmaker() as session:
+        await session.execute(delete(CartItem).where(CartItem.user_id == user_id))
+        await session.execute(insert(CartItem), [
+            {"user_id": user_id, "product_id": product_id, "quantity": 1} for product_id in range(1, size + 1)
+        ])
+        await session.commit()
+
+async def timed_checkout(sessionmaker, checkout, user_id: int) -> float:
+    async with sessionmaker() as session:
+        started = time.perf_counter()
+        await checkout(session, user_id)
+        return (time.perf_counter() - started) * 1000
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--concurrent", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = build_engine(temp_database_url("checkout.db"))
+    await seed_catalog(engine, users=args.concurrent)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+
+    statements = [0]
+    event.listen(engine.sync_engine, "before_cursor_execute", lambda *a: statements.__setitem__(0, statements[0] + 1))
+
+    print(f"{'позиций':>8}{'построчно, мс':>16}{'запросов':>10}{'набором, мс':>14}{'запросов':>10}")
+    for size in (1, 5, 10, 25, 50):
+        row = []
+        for checkout in (legacy_checkout, set_based_checkout):
+            timings, counts = [], []
+            for _ in range(args.repeat):
+                await fill_cart(sessionmaker, 1, size)
+                statements[0] = 0
+                timings.append(await timed_checkout(sessionmaker, checkout, 1))
+                counts.append(statements[0])
+            row += [statistics.median(timings), statistics.median(counts)]
+        print(f"{size:>8}{row[0]:>16.2f}{row[1]:>10.0f}{row[2]:>14.2f}{row[3]:>10.0f}")
+
+    print(f"\n{args.concurrent} одновременных заказов по 10 позиций:")
+    for checkout in (legacy_checkout, set_based_checkout):
+        for user_id in range(1, args.concurrent + 1):
+            await fill_cart(sessionmaker, user_id, 10)
+        started = time.perf_counter()
+        timings = await asyncio.gather(*(
+            timed_checkout(sessionmaker, checkout, user_id) for user_id in range(1, args.concurrent + 1)
+        ))
+        wall = (time.perf_counter() - started) * 1000
+        timings.sort()
+        print(f"   {checkout.__name__:<20} всего {wall:8.1f} мс, "
+              f"p50 {timings[len(timings) // 2]:7.1f} мс, p95 {timings[int(len(timings) * 0.95) - 1]:7.1f} мс")
+
+    await engine.dispose()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,182 @@
+"""
+Сквозная задержка доставки обновлений: polling против webhook
+Поднимает поддельный Bot API, запускает бота отдельным процессом (main.py) и шлет ему
+синтетические /start; задержка - от отправки обновления до прихода sendMessage с ответом.
+Запуск: python -m benchmarks.bench_delivery [--updates 200] [--rate 50] [--modes polling webhook]
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from aiohttp import ClientSession, web
+
+from benchmarks.common import temp_database_url
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOKEN = "123456:BENCH"
+API_PORT = 8781
+WEBHOOK_PORT = 8782
+WEBHOOK_SECRET = "bench-secret"
+
+class FakeTelegram:
+    """Минимальный Bot API: отдает обновления через getUpdates и засекает ответы бота"""
+
+    def __init__(self):
+        self.updates = []
+        self._new_updates = asyncio.Event()
+        self.sent_at = {}
+        self.latencies = []
+        self.ready = asyncio.Event()
+        self._message_ids = itertools.count(1)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        return app
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        form = await request.post()
+
+        if method == "getme":
+            return self.ok({"id": 123456, "is_bot": True, "first_name": "Bench", "username": "bench_bot"})
+        if method == "getupdates":
+            self.ready.set()
+            return self.ok(await self.get_updates(int(form.get("offset", 0)), float(form.get("timeout", 0))))
+        if method == "setwebhook":
+            self.ready.set()
+            return self.ok(True)
+        if method == "sendmessage":
+            chat_id = int(form["chat_id"])
+            started = self.sent_at.pop(chat_id, None)
+            if started is not None:
+                self.latencies.append(time.perf_counter() - started)
+            return self.ok({
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": form.get("text", ""),
+            })
+        return self.ok(True)
+
+    @staticmethod
+    def ok(result) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+    async def get_updates(self, offset: int, timeout: float) -> list:
+        self.updates = [update for update in self.updates if update["update_id"] >= offset]
+        if not self.updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:100]
+
+    def push(self, update: dict):
+        self.updates.append(update)
+        self._new_updates.set()
+
+def start_update(update_id: int) -> dict:
+    user_id = 1_000_000 + update_id
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Bench"},
+            "text": "/start",
+            "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+        },
+    }
+
+def bot_env(mode: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "BOT_TOKEN": TOKEN,
+        "ADMIN_ID": "0",
+        "BOT_MODE": mode,
+        "DATABASE_URL": temp_database_url("delivery.db"),
+        "TELEGRAM_API_URL": f"http://127.0.0.1:{API_PORT}",
+        "WEBHOOK_URL": f"http://127.0.0.1:{WEBHOOK_PORT}",
+        "WEBHOOK_SECRET": WEBHOOK_SECRET,
+        "WEBHOOK_HOST": "127.0.0.1",
+        "WEBHOOK_PORT": str(WEBHOOK_PORT),
+        # Меряем доставку, а не лимиты Telegram и запись на диск
+        "SEND_GLOBAL_RATE": "100000",
+        "SEND_GLOBAL_BURST": "100000",
+        "FSM_PERSIST": "false",
+    })
+    return env
+
+async def run_mode(mode: str, updates: int, rate: float, verbose: bool) -> list[float]:
+    telegram = FakeTelegram()
+    runner = web.AppRunner(telegram.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", API_PORT).start()
+
+    output = None if verbose else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, "main.py"], cwd=PROJECT_DIR, env=bot_env(mode), stdout=output, stderr=output
+    )
+    try:
+        await asyncio.wait_for(telegram.ready.wait(), timeout=30)
+        # Webhook регистрируется после старта HTTP-сервера, но дадим ему мгновение
+        await asyncio.sleep(0.5)
+
+        async with ClientSession() as client:
+            for update_id in range(1, updates + 1):
+                update = start_update(update_id)
+                telegram.sent_at[update["message"]["chat"]["id"]] = time.perf_counter()
+                if mode == "webhook":
+                    async with client.post(
+                        f"http://127.0.0.1:{WEBHOOK_PORT}/webhook",
+                        json=update,
+                        headers={"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET},
+                    ) as response:
+                        response.raise_for_status()
+                else:
+                    telegram.push(update)
+                await asyncio.sleep(1 / rate)
+
+        deadline = time.monotonic() + 30
+        while len(telegram.latencies) < updates and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        await runner.cleanup()
+    return telegram.latencies
+
+def report(mode: str, latencies: list[float], updates: int):
+    if not latencies:
+        print(f"{mode:<10}ответов нет")
+        return
+    ms = sorted(latency * 1000 for latency in latencies)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    print(
+        f"{mode:<10}{len(ms):>6}/{updates:<6}{statistics.mean(ms):>10.1f}"
+        f"{statistics.median(ms):>10.1f}{p95:>10.1f}{ms[-1]:>10.1f}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=50, help="обновлений в секунду")
+    parser.add_argument("--modes", nargs="+", default=["polling", "webhook"], choices=["polling", "webhook"])
+    parser.add_argument("--verbose", action="store_true", help="показывать вывод бота")
+    args = parser.parse_args()
+
+    print(f"{'режим':<10}{'ответов':>13}{'сред, мс':>10}{'p50':>10}{'p95':>10}{'макс':>10}")
+    for mode in args.modes:
+        latencies = asyncio.run(run_mode(mode, args.updates, args.rate, args.verbose))
+        report(mode, latencies, args.updates)
+
+if __name__ == "__main__":
+    main()
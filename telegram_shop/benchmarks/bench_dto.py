@@ -0,0 +1,99 @@
+"""
+Чтение для отрисовки: ORM-объекты против кортежей из database.dto
+Список товаров бренда и карточка товара: время на вызов и память, занятая результатом.
+Запуск: python -m benchmarks.bench_dto [--calls 1000]
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from benchmarks.common import temp_database_url, seed_catalog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import selectinload
+
+from database import queries
+from database.dto import ProductRow
+from database.engine import build_engine
+from database.models import Product
+from database.repository import ProductRepository
+
+BRAND_ID = 1
+PRODUCT_ID = 1
+
+async def orm_products(session):
+    """Как список товаров читался до DTO"""
+    rows = tuple((await session.scalars(
+        select(Product)
+        .where(Product.brand_id == BRAND_ID)
+        .where(Product.is_active == True)
+        .where(Product.quantity > 0)
+        .order_by(Product.name)
+    )).all())
+    for row in rows:
+        session.expunge(row)
+    return rows
+
+async def dto_products(session):
+    return tuple(ProductRow(*row) for row in await session.execute(
+        queries.PRODUCTS_IN_STOCK_BY_BRAND, {"brand_id": BRAND_ID}
+    ))
+
+async def orm_detail(session):
+    """Карточка товара с двумя selectinload"""
+    product = (await session.execute(
+        select(Product)
+        .options(selectinload(Product.brand), selectinload(Product.category))
+        .where(Product.id == PRODUCT_ID)
+    )).scalar_one()
+    return product.name, product.brand.name, product.category.name
+
+async def dto_detail(session):
+    product = await ProductRepository.get_product_detail(session, PRODUCT_ID)
+    return product.name, product.brand_name, product.category_name
+
+CASES = {
+    "products(20)": (orm_products, dto_products),
+    "product_detail": (orm_detail, dto_detail),
+}
+
+async def measure(sessionmaker, read, calls: int) -> tuple[float, float]:
+    """Микросекунды на вызов и килобайты, удерживаемые сессией и результатами 100 вызовов"""
+    async with sessionmaker() as session:
+        await read(session)
+        started = time.perf_counter()
+        for _ in range(calls):
+            await read(session)
+            session.expunge_all()
+        elapsed = (time.perf_counter() - started) / calls * 1e6
+
+    async with sessionmaker() as session:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        results = [await read(session) for _ in range(100)]
+        allocated = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del results
+    return elapsed, allocated / 100 / 1024
+
+async def run(calls: int):
+    engine = build_engine(temp_database_url("dto.db"))
+    await seed_catalog(engine)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+
+    print(f"{'чтение':<16}{'ORM, мкс':>10}{'DTO, мкс':>10}{'ORM, КБ':>10}{'DTO, КБ':>10}")
+    for name, (orm, dto) in CASES.items():
+        orm_us, orm_kb = await measure(sessionmaker, orm, calls)
+        dto_us, dto_kb = await measure(sessionmaker, dto, calls)
+        print(f"{name:<16}{orm_us:>10.1f}{dto_us:>10.1f}{orm_kb:>10.1f}{dto_kb:>10.1f}")
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls))
+
+if __name__ == "__main__":
+    main()
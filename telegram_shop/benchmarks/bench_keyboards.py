@@ -0,0 +1,77 @@
+"""
+Время и память на сборку клавиатур: без кэша и с кэшем
+Запуск: python -m benchmarks.bench_keyboards [--calls 20000]
+"""
+import argparse
+import timeit
+import tracemalloc
+from datetime import date
+from types import SimpleNamespace
+
+import benchmarks.common  # noqa: F401 - путь к проекту
+from bot.keyboards.main_menu import get_main_menu
+from bot.keyboards.cart import (
+    get_checkout_confirm_keyboard, get_payment_method_keyboard, get_dates_keyboard, build_dates_keyboard
+)
+from bot.keyboards.catalog import (
+    get_categories_keyboard, get_products_keyboard, build_categories_keyboard, build_products_keyboard
+)
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+CATEGORIES = [SimpleNamespace(id=i, name=f"Категория {i}") for i in range(1, 6)]
+PRODUCTS = [SimpleNamespace(id=i, name=f"Товар {i}", price=100 + i, quantity=i % 8) for i in range(1, 21)]
+
+def build_main_menu():
+    """Сборка главного меню как до кэширования"""
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text="🛍️ Каталог", callback_data="catalog")],
+        [InlineKeyboardButton(text="🛒 Корзина", callback_data="cart")],
+        [InlineKeyboardButton(text="📞 Связаться с продавцом", callback_data="contact_seller")],
+        [InlineKeyboardButton(text="ℹ️ О магазине", callback_data="about")]
+    ])
+
+CASES = {
+    "main_menu": (build_main_menu, get_main_menu),
+    "checkout_confirm": (None, get_checkout_confirm_keyboard),
+    "payment_method": (None, get_payment_method_keyboard),
+    "dates": (lambda: build_dates_keyboard.__wrapped__(date.today()), get_dates_keyboard),
+    "categories": (
+        lambda: build_categories_keyboard(CATEGORIES),
+        lambda: get_categories_keyboard(CATEGORIES, version=1),
+    ),
+    "products(20)": (
+        lambda: build_products_keyboard(PRODUCTS),
+        lambda: get_products_keyboard(PRODUCTS, version=1),
+    ),
+}
+
+def measure(func, calls: int) -> tuple[float, float]:
+    """Микросекунды и байты выделенной памяти на один вызов"""
+    func()
+    seconds = timeit.timeit(func, number=calls)
+
+    # Результаты удерживаем, чтобы посчитать объем памяти, который занимает каждая клавиатура
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = [func() for _ in range(100)]
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del results
+
+    return seconds / calls * 1e6, allocated / 100
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'клавиатура':<18}{'без кэша, мкс':>15}{'с кэшем, мкс':>15}{'байт/вызов без':>17}{'с кэшем':>10}")
+    for name, (uncached, cached) in CASES.items():
+        # Статические клавиатуры без отдельного билдера собираем заново из их же содержимого
+        uncached = uncached or (lambda kb=cached(): InlineKeyboardMarkup.model_validate(kb.model_dump()))
+        raw_us, raw_bytes = measure(uncached, args.calls)
+        hot_us, hot_bytes = measure(cached, args.calls)
+        print(f"{name:<18}{raw_us:>15.2f}{hot_us:>15.2f}{raw_bytes:>17.0f}{hot_bytes:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Стоимость построения запросов горячих путей: сборка select(...) на каждый вызов против готовых из database.queries
+Меряет отдельно построение выражения и полный session.execute на временной базе с каталогом.
+Запуск: python -m benchmarks.bench_queries [--calls 5000]
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import temp_database_url, seed_catalog
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from database import queries
+from database.engine import build_engine
+from database.models import Brand, CartItem, Category, Product, User
+
+USER_ID = 1
+TELEGRAM_ID = 1_000_001
+
+def _product_column(column):
+    return select(column).where(Product.id == CartItem.product_id).correlate(CartItem).scalar_subquery()
+
+# Как запросы строились в обработчиках и репозитории до database.queries
+INLINE = {
+    "user_identity": lambda: (
+        select(User.id, User.telegram_id, User.username, User.first_name, User.last_name)
+        .where(User.telegram_id == TELEGRAM_ID),
+        None,
+    ),
+    "brands_in_category": lambda: (
+        select(Brand.id, Brand.name)
+        .join(Product, Brand.id == Product.brand_id)
+        .where(Product.category_id == 1)
+        .where(Product.is_active == True)
+        .where(Brand.is_active == True)
+        .distinct(),
+        None,
+    ),
+    "product_detail": lambda: (
+        select(
+            Product.id, Product.name, Product.description, Product.price, Product.quantity,
+            Product.reserved_quantity, Product.is_active, Product.brand_id, Brand.name, Category.name,
+        )
+        .outerjoin(Brand, Brand.id == Product.brand_id)
+        .outerjoin(Category, Category.id == Product.category_id)
+        .where(Product.id == 1),
+        None,
+    ),
+    "cart_lines": lambda: (
+        select(
+            CartItem.id, CartItem.product_id, _product_column(Product.name), _product_column(Product.price),
+            CartItem.quantity, _product_column(Product.quantity),
+        ).where(CartItem.user_id == USER_ID).order_by(CartItem.id),
+        None,
+    ),
+}
+
+PREBUILT = {
+    "user_identity": lambda: (queries.USER_IDENTITY, {"telegram_id": TELEGRAM_ID}),
+    "brands_in_category": lambda: (queries.BRANDS_IN_CATEGORY, {"category_id": 1}),
+    "product_detail": lambda: (queries.PRODUCT_DETAIL, {"product_id": 1}),
+    "cart_lines": lambda: (queries.CART_LINES, {"user_id": USER_ID}),
+}
+
+def construction_us(build, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        build()
+    return (time.perf_counter() - started) / calls * 1e6
+
+async def execute_us(sessionmaker, build, calls: int) -> float:
+    async with sessionmaker() as session:
+        statement, params = build()
+        await session.execute(statement, params)
+        started = time.perf_counter()
+        for _ in range(calls):
+            statement, params = build()
+            (await session.execute(statement, params)).all()
+            session.expunge_all()
+        return (time.perf_counter() - started) / calls * 1e6
+
+async def run(calls: int):
+    url = temp_database_url("queries.db")
+    engine = build_engine(url)
+    await seed_catalog(engine)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    async with sessionmaker() as session:
+        await session.execute(queries.ADD_TO_CART, [
+            {"user_id": USER_ID, "product_id": product_id, "quantity": 1} for product_id in range(1, 6)
+        ])
+        await session.commit()
+
+    print(f"{'запрос':<20}{'сборка, мкс':>13}{'готовый':>10}{'execute, мкс':>15}{'готовый':>10}")
+    for name in INLINE:
+        inline_build = construction_us(INLINE[name], calls)
+        prebuilt_build = construction_us(PREBUILT[name], calls)
+        inline_exec = await execute_us(sessionmaker, INLINE[name], calls // 5)
+        prebuilt_exec = await execute_us(sessionmaker, PREBUILT[name], calls // 5)
+        print(f"{name:<20}{inline_build:>13.1f}{prebuilt_build:>10.1f}{inline_exec:>15.1f}{prebuilt_exec:>10.1f}")
+    await engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Сравнение профилей хранилища SQLite: чтение каталога и запись заказов
+Запуск: python -m benchmarks.bench_storage_profile [--seconds 5] [--readers 20] [--writers 4]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from benchmarks.common import temp_database_url, seed_catalog
+from database.engine import build_engine
+from database.storage import PROFILES
+from database.models import Product, Order, OrderItem
+from sqlalchemy import select, insert, update
+
+async def catalog_reader(engine, deadline: float, counter: list):
+    """Просмотр товаров бренда, как в show_products"""
+    while time.perf_counter() < deadline:
+        async with engine.connect() as conn:
+            await conn.execute(
+                select(Product)
+                .where(Product.brand_id == random.randint(1, 10))
+                .where(Product.is_active == True)
+                .where(Product.quantity > 0)
+                .order_by(Product.name)
+            )
+        counter[0] += 1
+
+async def checkout_writer(engine, deadline: float, counter: list, errors: list):
+    """Оформление заказа: заказ, позиции и списание остатков в одной транзакции"""
+    while time.perf_counter() < deadline:
+        product_ids = random.sample(range(1, 201), 3)
+        try:
+            async with engine.begin() as conn:
+                result = await conn.execute(
+                    insert(Order).values(
+                        user_id=random.randint(1, 50), total_amount=300,
+                        customer_name="Клиент", status="pending"
+                    )
+                )
+                order_id = result.inserted_primary_key[0]
+                await conn.execute(insert(OrderItem), [
+                    {"order_id": order_id, "product_id": pid, "product_name": "Товар",
+                     "product_price": 100, "quantity": 1}
+                    for pid in product_ids
+                ])
+                for pid in product_ids:
+                    await conn.execute(
+                        update(Product).where(Product.id == pid).values(quantity=Product.quantity - 1)
+                    )
+            counter[0] += 1
+        except Exception as e:
+            errors.append(type(e).__name__)
+
+async def run_profile(profile: str, seconds: float, readers: int, writers: int) -> dict:
+    engine = build_engine(temp_database_url(f"{profile}.db"), profile)
+    await seed_catalog(engine)
+
+    reads, writes, errors = [0], [0], []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(
+        *(catalog_reader(engine, deadline, reads) for _ in range(readers)),
+        *(checkout_writer(engine, deadline, writes, errors) for _ in range(writers)),
+    )
+    await engine.dispose()
+
+    return {
+        "profile": profile,
+        "reads_per_s": reads[0] / seconds,
+        "writes_per_s": writes[0] / seconds,
+        "errors": len(errors),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=20)
+    parser.add_argument("--writers", type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'профиль':<10}{'чтений/с':>12}{'заказов/с':>12}{'ошибок':>10}")
+    for profile in PROFILES:
+        row = await run_profile(profile, args.seconds, args.readers, args.writers)
+        print(f"{row['profile']:<10}{row['reads_per_s']:>12.1f}{row['writes_per_s']:>12.1f}{row['errors']:>10}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
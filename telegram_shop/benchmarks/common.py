@@ -0,0 +1,44 @@
+"""Общие утилиты бенчмарков: временная база с тестовым каталогом"""
+import os
+import sys
+import tempfile
+
+# Добавляем путь к проекту
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def temp_database_url(name: str = "bench.db") -> str:
+    """URL новой пустой базы во временной папке"""
+    path = os.path.join(tempfile.mkdtemp(prefix="shop_bench_"), name)
+    return f"sqlite+aiosqlite:///{path}"
+
+async def seed_catalog(engine, categories: int = 3, brands: int = 10, products_per_brand: int = 20,
+                       users: int = 50, quantity: int = 1_000_000):
+    """Заполняет базу каталогом и пользователями"""
+    from sqlalchemy import insert
+    from database.models import Base, Category, Brand, Product, User
+    from database.migrations import upgrade
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade)
+        await conn.execute(insert(Category), [
+            {"id": i, "name": f"Категория {i}", "is_active": True} for i in range(1, categories + 1)
+        ])
+        await conn.execute(insert(Brand), [
+            {"id": i, "name": f"Бренд {i}", "is_active": True} for i in range(1, brands + 1)
+        ])
+        await conn.execute(insert(Product), [
+            {
+                "name": f"Товар {brand}-{n}",
+                "price": 100 + n,
+                "quantity": quantity,
+                "is_active": True,
+                "category_id": (brand % categories) + 1,
+                "brand_id": brand,
+            }
+            for brand in range(1, brands + 1)
+            for n in range(products_per_brand)
+        ])
+        await conn.execute(insert(User), [
+            {"id": i, "telegram_id": 1_000_000 + i, "first_name": f"User {i}"} for i in range(1, users + 1)
+        ])
@@ -0,0 +1,169 @@
+"""
+Нагрузочный тест админ-панели: параллельные клиенты на /orders, /products, /database и /api/*
+Запускает admin_server.py отдельным процессом на временной базе с каталогом и заказами
+для каждого режима ADMIN_SERVER и сравнивает пропускную способность и задержки.
+Среди запросов есть тяжелый /api/debug_products (выгрузка всего каталога): в хорошем
+режиме он не должен задерживать остальные.
+Запуск: python -m benchmarks.load_admin [--clients 16] [--seconds 10] [--orders 20000] [--servers dev threaded]
+"""
+import argparse
+import asyncio
+import os
+import random
+import signal
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from aiohttp import ClientSession, CookieJar
+
+from benchmarks.common import temp_database_url, seed_catalog
+from database.engine import build_engine
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_ID = "777"
+PORT = 8791
+BASE_URL = f"http://127.0.0.1:{PORT}"
+STATUSES = ("pending", "confirmed", "completed", "cancelled")
+
+async def prepare_database(orders: int) -> str:
+    url = temp_database_url("admin_load.db")
+    engine = build_engine(url)
+    await seed_catalog(engine, brands=50, products_per_brand=40)
+    await engine.dispose()
+
+    path = url.replace("sqlite+aiosqlite:///", "")
+    connection = sqlite3.connect(path)
+    started = datetime(2024, 1, 1)
+    connection.executemany(
+        "INSERT INTO orders (user_id, status, total_amount, customer_name, created_at) VALUES (?, ?, ?, ?, ?)",
+        [
+            (i % 50 + 1, STATUSES[i % 4], 100 + i % 900, f"Покупатель {i}",
+             (started + timedelta(minutes=7 * i)).strftime("%Y-%m-%d %H:%M:%S.%f"))
+            for i in range(orders)
+        ],
+    )
+    connection.execute(
+        "INSERT INTO order_items (order_id, product_id, product_name, product_price, quantity) "
+        "SELECT id, id % 2000 + 1, 'Товар', 100, 2 FROM orders"
+    )
+    connection.commit()
+    connection.close()
+    return url
+
+def server_env(server: str, database_url: str) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "BOT_TOKEN": "1:LOAD",
+        "ADMIN_ID": ADMIN_ID,
+        "ADMIN_HOST": "127.0.0.1",
+        "ADMIN_PORT": str(PORT),
+        "ADMIN_SERVER": server,
+        "DATABASE_URL": database_url,
+    })
+    return env
+
+async def wait_ready(session: ClientSession, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{BASE_URL}/login") as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Админ-панель не запустилась")
+
+def pick_request(orders: int, cursors: list[str]):
+    """(метка, метод, путь, тело) случайного запроса"""
+    roll = random.random()
+    order_id = random.randint(1, orders)
+    if roll < 0.25:
+        return "/orders", "GET", "/orders", None
+    if roll < 0.40:
+        return "/products", "GET", "/products", None
+    if roll < 0.50:
+        return "/database", "GET", "/database", None
+    if roll < 0.70:
+        cursor = random.choice(cursors) if cursors else ""
+        return "/api/orders", "GET", f"/api/orders?cursor={cursor}", None
+    if roll < 0.85:
+        return "/api/order_details", "GET", f"/api/order_details/{order_id}", None
+    if roll < 0.95:
+        body = {"order_id": order_id, "status": random.choice(("confirmed", "completed"))}
+        return "/api/update_order_status", "POST", "/api/update_order_status", body
+    return "/api/debug_products", "GET", "/api/debug_products", None
+
+async def client(deadline: float, orders: int, cursors: list[str], latencies: dict, errors: dict):
+    async with ClientSession(cookie_jar=CookieJar(unsafe=True)) as session:
+        async with session.post(f"{BASE_URL}/login", data={"telegram_id": ADMIN_ID}) as response:
+            await response.read()
+        while time.monotonic() < deadline:
+            label, method, path, body = pick_request(orders, cursors)
+            started = time.perf_counter()
+            try:
+                async with session.request(method, f"{BASE_URL}{path}", json=body) as response:
+                    payload = await response.read()
+                    ok = response.status == 200 and b'"error"' not in payload[:200]
+                    if label == "/api/orders" and ok:
+                        cursor = (await response.json()).get("next_cursor")
+                        if cursor and len(cursors) < 200:
+                            cursors.append(cursor)
+            except Exception:
+                ok = False
+            latencies.setdefault(label, []).append(time.perf_counter() - started)
+            if not ok:
+                errors[label] = errors.get(label, 0) + 1
+
+async def run_server(server: str, database_url: str, clients: int, seconds: float, orders: int, verbose: bool):
+    output = None if verbose else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, "admin_server.py"], cwd=PROJECT_DIR, env=server_env(server, database_url),
+        stdout=output, stderr=output, start_new_session=True,
+    )
+    latencies, errors = {}, {}
+    try:
+        async with ClientSession() as session:
+            await wait_ready(session)
+        deadline = time.monotonic() + seconds
+        cursors = []
+        started = time.perf_counter()
+        await asyncio.gather(*(client(deadline, orders, cursors, latencies, errors) for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+    finally:
+        # dev-режим запускает дочерний процесс перезагрузчика: останавливаем всю группу
+        os.killpg(process.pid, signal.SIGTERM)
+        process.wait(timeout=10)
+    return latencies, errors, elapsed
+
+def report(server: str, latencies: dict, errors: dict, elapsed: float):
+    total = sum(len(values) for values in latencies.values())
+    print(f"\n{server}: {total} запросов за {elapsed:.1f} с, {total / elapsed:.0f} rps, ошибок {sum(errors.values())}")
+    print(f"   {'эндпоинт':<28}{'запросов':>9}{'p50, мс':>10}{'p95, мс':>10}{'макс':>10}")
+    for label in sorted(latencies):
+        ms = sorted(value * 1000 for value in latencies[label])
+        p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+        print(f"   {label:<28}{len(ms):>9}{statistics.median(ms):>10.1f}{p95:>10.1f}{ms[-1]:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--servers", nargs="+", default=["dev", "threaded"], choices=["dev", "threaded", "waitress"])
+    parser.add_argument("--verbose", action="store_true", help="показывать вывод сервера")
+    args = parser.parse_args()
+
+    database_url = asyncio.run(prepare_database(args.orders))
+    for server in args.servers:
+        latencies, errors, elapsed = asyncio.run(
+            run_server(server, database_url, args.clients, args.seconds, args.orders, args.verbose)
+        )
+        report(server, latencies, errors, elapsed)
+
+if __name__ == "__main__":
+    main()
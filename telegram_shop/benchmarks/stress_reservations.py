@@ -0,0 +1,140 @@
+"""
+Стресс-тест резервов: много покупателей одновременно оформляют последние единицы товара
+Проверяет, что товар не продан сверх остатка и резервы сходятся с таблицей stock_holds.
+Запуск: python -m benchmarks.stress_reservations [--stock 5] [--users 60] [--rounds 5] [--processes 4]
+Код возврата 1 - обнаружена перепродажа или расхождение резервов.
+"""
+import argparse
+import asyncio
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from benchmarks.common import temp_database_url, seed_catalog
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from database.engine import build_engine
+from database.models import OrderItem, Product, StockHold
+from database.repository import (
+    CartRepository, OrderRepository, ReservationRepository, InsufficientStockError
+)
+
+PRODUCT_ID = 1
+ORDER_DATA = {
+    "customer_name": "Клиент",
+    "delivery_method": "pickup",
+    "delivery_address": "3-е общежитие ВГТУ",
+    "delivery_date": "01.01.2030",
+    "delivery_time": "16:00-18:00",
+    "payment_method": "cash",
+}
+
+async def shopper(sessionmaker, user_id: int, rounds: int, stats: dict):
+    """Покупатель: корзина -> резерв -> подтверждение, отмена или брошенное оформление"""
+    for _ in range(rounds):
+        async with sessionmaker() as session:
+            try:
+                await CartRepository.add_to_cart(session, user_id, PRODUCT_ID, random.randint(1, 2))
+                scenario = random.random()
+                ttl = 0.05 if scenario < 0.2 else None
+                lines = await ReservationRepository.hold_cart(session, user_id, ttl_seconds=ttl)
+                if not lines:
+                    continue
+                await asyncio.sleep(random.uniform(0, 0.1))
+
+                if scenario < 0.2:
+                    # Брошенное оформление: резерв истечет сам
+                    await asyncio.sleep(0.06)
+                    await ReservationRepository.release_expired(session)
+                    stats["expired"] += 1
+                elif scenario < 0.35:
+                    await ReservationRepository.release_user_holds(session, user_id)
+                    stats["cancelled"] += 1
+                elif await OrderRepository.create_order_from_cart(session, user_id, ORDER_DATA):
+                    stats["orders"] += 1
+            except InsufficientStockError:
+                await session.rollback()
+                stats["rejected"] += 1
+            except Exception as e:
+                # Блокировки SQLite под нагрузкой допустимы, важна только целостность остатков
+                await session.rollback()
+                stats["errors"] += 1
+                stats.setdefault("error_types", set()).add(type(e).__name__)
+
+async def run_shoppers(url: str, user_ids: list[int], rounds: int) -> dict:
+    engine = build_engine(url)
+    sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+    stats = {"orders": 0, "rejected": 0, "cancelled": 0, "expired": 0, "errors": 0}
+    await asyncio.gather(*(shopper(sessionmaker, user_id, rounds, stats) for user_id in user_ids))
+    await engine.dispose()
+    stats["error_types"] = sorted(stats.get("error_types", ()))
+    return stats
+
+def run_process(url: str, user_ids: list[int], rounds: int) -> dict:
+    return asyncio.run(run_shoppers(url, user_ids, rounds))
+
+async def prepare(url: str, users: int, stock: int):
+    engine = build_engine(url)
+    await seed_catalog(engine, users=users)
+    async with engine.begin() as conn:
+        await conn.execute(update(Product).where(Product.id == PRODUCT_ID).values(quantity=stock))
+    await engine.dispose()
+
+async def verify(url: str, stock: int) -> list[str]:
+    engine = build_engine(url)
+    problems = []
+    async with engine.connect() as conn:
+        quantity, reserved = (await conn.execute(
+            select(Product.quantity, Product.reserved_quantity).where(Product.id == PRODUCT_ID)
+        )).one()
+        sold = await conn.scalar(
+            select(func.coalesce(func.sum(OrderItem.quantity), 0)).where(OrderItem.product_id == PRODUCT_ID)
+        )
+        held = await conn.scalar(
+            select(func.coalesce(func.sum(StockHold.quantity), 0)).where(StockHold.product_id == PRODUCT_ID)
+        )
+    await engine.dispose()
+
+    print(f"📦 остаток {quantity}, продано {sold}, в резерве {reserved} (по stock_holds {held})")
+    if sold > stock:
+        problems.append(f"перепродажа: продано {sold} при остатке {stock}")
+    if quantity < 0:
+        problems.append(f"отрицательный остаток: {quantity}")
+    if quantity + sold != stock:
+        problems.append(f"остаток не сходится: {quantity} + {sold} != {stock}")
+    if reserved != held:
+        problems.append(f"reserved_quantity={reserved}, а активных резервов {held}")
+    if reserved > quantity:
+        problems.append(f"резерв {reserved} больше остатка {quantity}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stock", type=int, default=5)
+    parser.add_argument("--users", type=int, default=60)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    url = temp_database_url("reservations.db")
+    asyncio.run(prepare(url, args.users, args.stock))
+
+    user_ids = list(range(1, args.users + 1))
+    batches = [user_ids[i::args.processes] for i in range(args.processes)]
+    with ProcessPoolExecutor(args.processes) as pool:
+        results = list(pool.map(run_process, [url] * len(batches), batches, [args.rounds] * len(batches)))
+
+    totals = {key: sum(r[key] for r in results) for key in ("orders", "rejected", "cancelled", "expired", "errors")}
+    error_types = sorted({t for r in results for t in r["error_types"]})
+    print(f"🧾 {totals}" + (f" {error_types}" if error_types else ""))
+
+    problems = asyncio.run(verify(url, args.stock))
+    if problems:
+        for problem in problems:
+            print(f"❌ {problem}")
+        sys.exit(1)
+    print("✅ Перепродаж нет, резервы сходятся")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+import asyncio
+
+from aiogram import Bot
+
+from database.engine import AsyncSessionLocal, engine
+from database.repository import ReservationRepository, OutboxRepository
+from database.catalog import catalog_store
+from database.table_counters import reconcile
+from bot.notifications import OutboxSender
+from bot.fsm_storage import fsm_storage
+import config
+
+async def run_periodic(name: str, interval: float, job):
+    """Выполняет job каждые interval секунд, ошибки не останавливают цикл"""
+    while True:
+        try:
+            await job()
+        except Exception as e:
+            print(f"❌ Ошибка фоновой задачи {name}: {e}")
+        await asyncio.sleep(interval)
+
+async def release_expired_holds():
+    """Снимает просроченные резервы товара"""
+    async with AsyncSessionLocal() as session:
+        await ReservationRepository.release_expired(session)
+
+async def prune_outbox():
+    """Удаляет давно отправленные уведомления, чтобы outbox не рос бесконечно"""
+    async with AsyncSessionLocal() as session:
+        removed = await OutboxRepository.prune_sent(session, config.OUTBOX_RETENTION_DAYS)
+    if removed:
+        print(f"🧹 Удалено отправленных уведомлений: {removed}")
+
+async def refresh_catalog():
+    """Пересобирает снимок каталога, если каталог изменился"""
+    async with AsyncSessionLocal() as session:
+        if await catalog_store.refresh(session):
+            stats = catalog_store.stats()
+            print(f"📚 Снимок каталога v{stats['version']}: {stats['products']} товаров за {stats['build_time'] * 1000:.1f} мс")
+
+async def reconcile_table_counters():
+    """Сверяет счетчики строк для админ-панели с реальным числом строк"""
+    async with engine.begin() as conn:
+        drift = await conn.run_sync(reconcile)
+    for table, (stored, actual) in drift.items():
+        print(f"⚠️ Счетчик строк {table} разошелся: {stored} -> {actual}")
+
+async def persist_fsm_states():
+    """Чистит просроченные состояния FSM и сохраняет изменения в базу"""
+    fsm_storage.sweep()
+    await fsm_storage.flush()
+
+def start_background_tasks(bot: Bot) -> list[asyncio.Task]:
+    """Запуск фоновых задач бота"""
+    return [
+        asyncio.create_task(run_periodic(
+            "reservations", config.RESERVATION_SWEEP_INTERVAL, release_expired_holds
+        )),
+        asyncio.create_task(OutboxSender(bot).run()),
+        asyncio.create_task(run_periodic("outbox_prune", config.OUTBOX_PRUNE_INTERVAL, prune_outbox)),
+        asyncio.create_task(run_periodic("fsm", config.FSM_FLUSH_INTERVAL, persist_fsm_states)),
+        asyncio.create_task(run_periodic("catalog", config.CATALOG_VERSION_CHECK_INTERVAL, refresh_catalog)),
+        asyncio.create_task(run_periodic(
+            "table_counters", config.TABLE_COUNTERS_RECONCILE_INTERVAL, reconcile_table_counters
+        )),
+    ]
+
+async def stop_background_tasks(tasks: list[asyncio.Task]):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
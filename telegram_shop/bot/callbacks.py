@@ -0,0 +1,160 @@
+from typing import Any, Literal, Optional
+
+from aiogram import Router
+from aiogram.dispatcher.event.handler import CallableObject
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import CallbackQuery
+from pydantic import Field
+
+SEPARATOR = ":"
+
+# Схемы данных кнопок: pack() собирает callback_data, unpack() проверяет типы
+
+class CategoryCallback(CallbackData, prefix="category"):
+    id: int
+
+class BrandCallback(CallbackData, prefix="brand"):
+    id: int
+
+class ProductCallback(CallbackData, prefix="product"):
+    id: int
+
+class AddToCartCallback(CallbackData, prefix="add_to_cart"):
+    product_id: int
+
+class CartItemCallback(CallbackData, prefix="item"):
+    item_id: int
+
+class IncreaseCallback(CallbackData, prefix="increase"):
+    item_id: int
+
+class DecreaseCallback(CallbackData, prefix="decrease"):
+    item_id: int
+
+class RemoveCallback(CallbackData, prefix="remove"):
+    item_id: int
+
+class PickupCallback(CallbackData, prefix="pickup"):
+    point: Literal["vgtu", "tereshkovoy"]
+
+class DateCallback(CallbackData, prefix="date"):
+    value: str = Field(pattern=r"^\d{2}\.\d{2}\.\d{4}$")
+
+class PaymentCallback(CallbackData, prefix="payment"):
+    method: Literal["cash", "card_disabled"]
+
+class CallbackRoutingError(ValueError):
+    """Два обработчика претендуют на одни и те же данные кнопки"""
+
+class Route:
+    __slots__ = ("key", "schema", "handler", "name")
+
+    def __init__(self, key: str, schema: Optional[type[CallbackData]], handler):
+        self.key = key
+        self.schema = schema
+        self.handler = CallableObject(callback=handler)
+        self.name = f"{handler.__module__}.{handler.__qualname__}"
+
+class TrieNode:
+    __slots__ = ("children", "static", "typed")
+
+    def __init__(self):
+        self.children: dict[str, TrieNode] = {}
+        self.static: Optional[Route] = None
+        self.typed: Optional[Route] = None
+
+class CallbackRouter:
+    """
+    Регистрация обработчиков callback-кнопок
+
+    Обработчик вешается либо на точную строку (static), либо на схему CallbackData (on).
+    compile_callback_router() собирает все регистрации в префиксное дерево: поиск обработчика
+    идет по символам префикса, а не перебором фильтров по всем роутерам.
+    """
+
+    def __init__(self):
+        self.routes: list[Route] = []
+
+    def static(self, data: str):
+        def decorator(handler):
+            self.routes.append(Route(data, None, handler))
+            return handler
+        return decorator
+
+    def on(self, schema: type[CallbackData]):
+        def decorator(handler):
+            self.routes.append(Route(schema.__prefix__, schema, handler))
+            return handler
+        return decorator
+
+class CompiledCallbackRouter:
+    def __init__(self, routes: list[Route]):
+        self.root = TrieNode()
+        self.malformed = 0
+        self.unknown = 0
+        for route in routes:
+            self._insert(route)
+        self._check_shadowing(routes)
+
+    def _insert(self, route: Route):
+        node = self.root
+        for char in route.key:
+            node = node.children.setdefault(char, TrieNode())
+
+        slot = "typed" if route.schema else "static"
+        existing = getattr(node, slot)
+        if existing is not None:
+            raise CallbackRoutingError(
+                f"callback '{route.key}' зарегистрирован дважды: {existing.name} и {route.name}"
+            )
+        setattr(node, slot, route)
+
+    def _check_shadowing(self, routes: list[Route]):
+        # Точная строка вида "<префикс схемы>:..." разбиралась бы как данные схемы
+        for route in routes:
+            if route.schema is None and SEPARATOR in route.key:
+                typed = self.resolve_route(route.key)
+                if typed is not None and typed is not route:
+                    raise CallbackRoutingError(
+                        f"callback '{route.key}' ({route.name}) перекрыт схемой {typed.name}"
+                    )
+
+    def resolve_route(self, data: str) -> Optional[Route]:
+        """Обработчик по данным кнопки за один проход по префиксу"""
+        node = self.root
+        for char in data:
+            if char == SEPARATOR and node.typed is not None:
+                return node.typed
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node.static
+
+    async def dispatch(self, callback: CallbackQuery, **data: Any) -> Any:
+        route = self.resolve_route(callback.data or "")
+        if route is None:
+            self.unknown += 1
+            await callback.answer("⚠️ Кнопка устарела, откройте меню заново")
+            return None
+
+        if route.schema is not None:
+            try:
+                data["callback_data"] = route.schema.unpack(callback.data)
+            except (TypeError, ValueError):
+                # Битые данные отсекаем до обращения к базе
+                self.malformed += 1
+                print(f"⚠️ Некорректные данные кнопки: {callback.data!r}")
+                await callback.answer("⚠️ Кнопка устарела, откройте меню заново")
+                return None
+
+        return await route.handler.call(callback, **data)
+
+    def as_router(self) -> Router:
+        """aiogram-роутер с единственным обработчиком callback-запросов"""
+        router = Router(name="callbacks")
+        router.callback_query.register(self.dispatch)
+        return router
+
+def compile_callback_router(*routers: CallbackRouter) -> CompiledCallbackRouter:
+    """Собирает регистрации модулей; дубли и перекрытия - ошибка при старте"""
+    return CompiledCallbackRouter([route for router in routers for route in router.routes])
@@ -0,0 +1,106 @@
+import asyncio
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+from aiogram.types import CallbackQuery
+
+@dataclass
+class Burst:
+    """Серия нажатий на одном сообщении, еще не примененная к базе"""
+    user_id: int
+    owner: int
+    callback: CallbackQuery
+    deltas: dict[int, int] = field(default_factory=dict)
+    applied: bool = False
+    timer: Optional[asyncio.Task] = None
+
+class CallbackCoalescer:
+    """
+    Склеивает быстрые повторные нажатия на одном сообщении
+
+    Первое нажатие открывает окно; нажатия в этом окне только суммируют изменения.
+    По окончании окна flush вызывается один раз с суммой изменений и последним callback.
+    Применения по одному ключу идут строго по очереди, поэтому последним на экран
+    попадает состояние после последнего изменения в базе.
+    settle() применяет серии пользователя сразу: так его следующее действие не застанет
+    запоздалую перерисовку, которая затрет уже новый экран. drain() применяет все серии
+    при остановке, чтобы нажатия из последнего окна не потерялись.
+    """
+
+    def __init__(self, window: float, flush: Callable[[CallbackQuery, int, dict[int, int]], Awaitable[Any]]):
+        self.window = window
+        self.flush = flush
+        self._bursts: dict[Hashable, Burst] = {}
+        self._locks = weakref.WeakValueDictionary()
+        self._tasks = set()
+        # Telegram id -> серии, которые еще не применены или применяются прямо сейчас
+        self._by_owner: dict[int, dict[Hashable, Burst]] = {}
+        self.taps = 0
+        self.flushes = 0
+
+    def stats(self) -> dict:
+        return {"taps": self.taps, "flushes": self.flushes, "pending": len(self._bursts)}
+
+    def submit(self, key: Hashable, callback: CallbackQuery, user_id: int, item_id: int, delta: int):
+        """Добавить нажатие в текущую серию по ключу (обычно чат и сообщение)"""
+        self.taps += 1
+        burst = self._bursts.get(key)
+        if burst is None:
+            burst = self._bursts[key] = Burst(user_id=user_id, owner=callback.from_user.id, callback=callback)
+            self._by_owner.setdefault(burst.owner, {})[key] = burst
+            task = burst.timer = asyncio.create_task(self._run(key, burst))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        burst.callback = callback
+        burst.deltas[item_id] = burst.deltas.get(item_id, 0) + delta
+
+    async def settle(self, owner: int):
+        """Применить серии пользователя (Telegram id), не дожидаясь конца окна"""
+        for key, burst in list(self._by_owner.get(owner, {}).items()):
+            await self._apply(key, burst)
+
+    async def drain(self):
+        """Применить все открытые серии и дождаться их задач - при остановке бота"""
+        for key, burst in list(self._bursts.items()):
+            await self._apply(key, burst)
+            # Серия из _bursts еще не начала применяться по таймеру: он только спит
+            burst.timer.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def _run(self, key: Hashable, burst: Burst):
+        await asyncio.sleep(self.window)
+        await self._apply(key, burst)
+
+    async def _apply(self, key: Hashable, burst: Burst):
+        # Нажатия после закрытия окна начнут новую серию
+        if self._bursts.get(key) is burst:
+            del self._bursts[key]
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        async with lock:
+            # Серию уже применил settle() или таймер - второй раз не применяем
+            if burst.applied:
+                return
+            burst.applied = True
+            try:
+                deltas = {item_id: delta for item_id, delta in burst.deltas.items() if delta}
+                if not deltas:
+                    return
+                self.flushes += 1
+                await self.flush(burst.callback, burst.user_id, deltas)
+            except Exception as e:
+                print(f"❌ Ошибка применения нажатий {key}: {e}")
+            finally:
+                self._forget(key, burst)
+
+    def _forget(self, key: Hashable, burst: Burst):
+        bursts = self._by_owner.get(burst.owner)
+        if bursts is not None and bursts.get(key) is burst:
+            del bursts[key]
+            if not bursts:
+                del self._by_owner[burst.owner]
@@ -0,0 +1,278 @@
+import json
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Mapping, Optional
+
+import pytz
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database.engine import AsyncSessionLocal
+from database.models import FsmState
+import config
+
+class StateRecord:
+    """Запись FSM одного пользователя: пустые данные не хранятся, имена состояний интернированы"""
+    __slots__ = ("state", "data", "touched_at")
+
+    def __init__(self, state: Optional[str] = None, data: Optional[dict] = None, touched_at: float = 0.0):
+        self.state = state
+        self.data = data
+        self.touched_at = touched_at
+
+def encode_key(key: StorageKey) -> str:
+    return json.dumps(
+        [key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny],
+        separators=(",", ":"),
+    )
+
+def decode_key(raw: str) -> StorageKey:
+    bot_id, chat_id, user_id, thread_id, business_connection_id, destiny = json.loads(raw)
+    return StorageKey(
+        bot_id=bot_id, chat_id=chat_id, user_id=user_id, thread_id=thread_id,
+        business_connection_id=business_connection_id, destiny=destiny,
+    )
+
+class BoundedStorage(BaseStorage):
+    """
+    FSM-хранилище в памяти с лимитом записей и сроком жизни
+
+    Записи, не использованные дольше ttl секунд, удаляются; сверх max_records вытесняются
+    давно не использованные. При persist=True изменения копятся и пишутся в таблицу fsm_states
+    фоновым flush(), а load() поднимает их при старте - обработчики на диск не ждут.
+    Вытеснение освобождает только память: строка в fsm_states остается, а запись читается
+    из базы при следующем обращении пользователя. Пока вытесненная запись не записана
+    flush(), она ждет в _pending.
+    """
+
+    def __init__(self, max_records: int, ttl: float, persist: bool = False):
+        self.max_records = max_records
+        self.ttl = ttl
+        self.persist = persist
+        self._records: OrderedDict[StorageKey, StateRecord] = OrderedDict()
+        self._dirty: set[StorageKey] = set()
+        # Вытесненные ключи, которые есть в fsm_states, -> время последнего использования
+        self._spilled: OrderedDict[StorageKey, float] = OrderedDict()
+        self._pending: dict[StorageKey, StateRecord] = {}
+        self.expired = 0
+        self.evicted = 0
+        self.restored = 0
+        self.flushed = 0
+
+    def stats(self) -> dict:
+        return {
+            "records": len(self._records),
+            "dirty": len(self._dirty),
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "spilled": len(self._spilled),
+            "restored": self.restored,
+            "flushed": self.flushed,
+        }
+
+    def _drop(self, key: StorageKey):
+        self._records.pop(key, None)
+        if self.persist:
+            self._dirty.add(key)
+
+    def _get(self, key: StorageKey) -> Optional[StateRecord]:
+        record = self._records.get(key)
+        if record is None:
+            return None
+        if time.time() - record.touched_at > self.ttl:
+            self.expired += 1
+            self._drop(key)
+            return None
+        record.touched_at = time.time()
+        self._records.move_to_end(key)
+        return record
+
+    async def _restore(self, key: StorageKey):
+        """Возвращает в память вытесненную запись: из _pending или из fsm_states"""
+        touched_at = self._spilled.get(key)
+        if touched_at is None:
+            return
+        record = self._pending.get(key)
+        if record is None:
+            async with AsyncSessionLocal() as session:
+                row = (await session.execute(
+                    select(FsmState.state, FsmState.data).where(FsmState.key == encode_key(key))
+                )).first()
+            if row is not None:
+                record = StateRecord(
+                    sys.intern(row.state) if row.state else None,
+                    json.loads(row.data) if row.data else None,
+                )
+        # Пока шел запрос, запись могли вытеснить снова или перезаписать
+        if self._spilled.get(key) != touched_at:
+            return
+        del self._spilled[key]
+        self._pending.pop(key, None)
+        if record is not None:
+            record.touched_at = touched_at
+            self.restored += 1
+            self._records[key] = record
+            self._evict()
+
+    def _evict(self):
+        while len(self._records) > self.max_records:
+            key, record = self._records.popitem(last=False)
+            self.evicted += 1
+            if not self.persist:
+                continue
+            self._spilled[key] = record.touched_at
+            if key in self._dirty:
+                self._pending[key] = record
+
+    def _save(self, key: StorageKey, state: Optional[str], data: Optional[dict]):
+        self._spilled.pop(key, None)
+        self._pending.pop(key, None)
+        # Пустая запись ничем не отличается от отсутствующей
+        if state is None and not data:
+            if key in self._records:
+                self._drop(key)
+            return
+
+        self._records[key] = StateRecord(state, data or None, time.time())
+        self._records.move_to_end(key)
+        if self.persist:
+            self._dirty.add(key)
+        self._evict()
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        await self._restore(key)
+        record = self._get(key)
+        self._save(key, sys.intern(state) if state else None, record.data if record else None)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        await self._restore(key)
+        record = self._get(key)
+        return record.state if record else None
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            msg = f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            raise DataNotDictLikeError(msg)
+        await self._restore(key)
+        record = self._get(key)
+        self._save(key, record.state if record else None, data.copy())
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        await self._restore(key)
+        record = self._get(key)
+        return record.data.copy() if record and record.data else {}
+
+    def sweep(self):
+        """Удаляет записи с истекшим сроком"""
+        deadline = time.time() - self.ttl
+        # Порядок - по последнему использованию, поэтому просроченные всегда в начале
+        while self._records:
+            key, record = next(iter(self._records.items()))
+            if record.touched_at >= deadline:
+                break
+            self.expired += 1
+            self._drop(key)
+        while self._spilled:
+            key, touched_at = next(iter(self._spilled.items()))
+            if touched_at >= deadline:
+                break
+            # Строка в базе устарела: ее удалит load() при следующем старте
+            self.expired += 1
+            del self._spilled[key]
+            self._pending.pop(key, None)
+
+    async def load(self):
+        """Поднимает из базы состояния, срок которых еще не истек"""
+        if not self.persist:
+            return
+        deadline = datetime.fromtimestamp(time.time() - self.ttl, pytz.utc).replace(tzinfo=None)
+        async with AsyncSessionLocal() as session:
+            await session.execute(delete(FsmState).where(FsmState.updated_at < deadline))
+            rows = (await session.execute(
+                select(FsmState.key, FsmState.state, FsmState.data, FsmState.updated_at)
+                .order_by(FsmState.updated_at)
+            )).all()
+            await session.commit()
+
+        # Сверх лимита в память поднимаются самые свежие, остальные читаются по обращению
+        spilled = max(len(rows) - self.max_records, 0)
+        for raw_key, state, data, updated_at in rows[:spilled]:
+            self._spilled[decode_key(raw_key)] = updated_at.replace(tzinfo=pytz.utc).timestamp()
+        for raw_key, state, data, updated_at in rows[spilled:]:
+            self._records[decode_key(raw_key)] = StateRecord(
+                sys.intern(state) if state else None,
+                json.loads(data) if data else None,
+                updated_at.replace(tzinfo=pytz.utc).timestamp(),
+            )
+        print(f"💾 Восстановлено состояний FSM: {len(self._records)}, в базе до обращения: {spilled}")
+
+    async def flush(self):
+        """Записывает накопленные изменения в базу одной транзакцией"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+
+        rows, removed = [], []
+        pending = {}
+        for key in dirty:
+            record = self._records.get(key)
+            if record is None and key in self._pending:
+                record = pending[key] = self._pending[key]
+            if record is None:
+                removed.append(encode_key(key))
+                continue
+            try:
+                data = json.dumps(record.data, ensure_ascii=False) if record.data else None
+            except (TypeError, ValueError) as e:
+                print(f"⚠️ Состояние FSM {key.user_id} не сохранено: {e}")
+                continue
+            rows.append({
+                "key": encode_key(key),
+                "state": record.state,
+                "data": data,
+                "updated_at": datetime.fromtimestamp(record.touched_at, pytz.utc).replace(tzinfo=None),
+            })
+
+        try:
+            async with AsyncSessionLocal() as session:
+                if rows:
+                    stmt = sqlite_insert(FsmState)
+                    await session.execute(
+                        stmt.on_conflict_do_update(
+                            index_elements=[FsmState.key],
+                            set_={
+                                "state": stmt.excluded.state,
+                                "data": stmt.excluded.data,
+                                "updated_at": stmt.excluded.updated_at,
+                            }
+                        ),
+                        rows,
+                    )
+                if removed:
+                    await session.execute(delete(FsmState).where(FsmState.key.in_(removed)))
+                await session.commit()
+        except Exception:
+            # Повторим при следующем flush; изменения, сделанные с тех пор, уже в _dirty
+            self._dirty |= dirty
+            raise
+        for key, record in pending.items():
+            # Вытесненная запись записана: дальше ее читает _restore из базы
+            if self._pending.get(key) is record and key not in self._dirty:
+                del self._pending[key]
+        self.flushed += len(rows) + len(removed)
+
+    async def close(self) -> None:
+        if self.persist:
+            await self.flush()
+
+fsm_storage = BoundedStorage(
+    max_records=config.FSM_MAX_RECORDS,
+    ttl=config.FSM_STATE_TTL,
+    persist=config.FSM_PERSIST,
+)
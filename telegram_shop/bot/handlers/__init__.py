@@ -1,13 +1,14 @@
-from .start import router as start_router
-from .catalog import router as catalog_router
-from .cart import router as cart_router
-from .order import router as order_router
+from .start import router as start_router, callbacks as start_callbacks
+from .catalog import callbacks as catalog_callbacks
+from .cart import callbacks as cart_callbacks
+from .order import callbacks as order_callbacks
 from .admin import router as admin_router
 
 __all__ = [
     'start_router',
-    'catalog_router', 
-    'cart_router',
-    'order_router',
+    'start_callbacks',
+    'catalog_callbacks',
+    'cart_callbacks',
+    'order_callbacks',
     'admin_router'
-]
\ No newline at end of file
+]
@@ -6,6 +6,10 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 import config
 from utils.states import AdminStates
+from bot.middlewares.rate_limit import send_scheduler
+from bot.render_cache import render_stats
+from database.catalog import catalog_store
+from database.repository import OrderStatsRepository, OutboxRepository
 
 router = Router()
 
@@ -22,7 +26,55 @@ async def admin_panel(message: Message):
         "/add_product - Добавить товар\n"
         "/add_category - Добавить категорию\n"
         "/add_brand - Добавить бренд\n"
-        "/stats - Статистика"
+        "/stats - Статистика\n"
+        "/metrics - Очередь исходящих сообщений"
+    )
+
+@router.message(Command("metrics"))
+async def send_metrics(message: Message, session: AsyncSession):
+    """Метрики планировщика исходящих сообщений"""
+    if message.from_user.id != config.ADMIN_ID:
+        await message.answer("❌ Доступ запрещен")
+        return
+    
+    stats = send_scheduler.stats()
+    render = render_stats.as_dict()
+    catalog = catalog_store.stats()
+    dead = await OutboxRepository.count_dead(session, config.OUTBOX_MAX_ATTEMPTS)
+    await message.answer(
+        "📤 Исходящие сообщения\n\n"
+        f"Отправлено: {stats['sent']}\n"
+        f"Повторов после 429: {stats['retries']}\n"
+        f"В очереди сейчас: {stats['queue_depth']} (максимум {stats['max_queue_depth']})\n"
+        f"Ожидание: в среднем {stats['avg_wait']:.3f} с, максимум {stats['max_wait']:.3f} с\n"
+        f"☠️ Уведомления без доставки после {config.OUTBOX_MAX_ATTEMPTS} попыток: {dead}\n\n"
+        f"✏️ Правки сообщений: {render['edited']}, пропущено без изменений: {render['skipped']}, "
+        f"\"not modified\" от Telegram: {render['not_modified']}\n\n"
+        f"📚 Каталог v{catalog['version']}: {catalog['products']} товаров, "
+        f"пересборок {catalog['rebuilds']}, последняя {catalog['build_time'] * 1000:.1f} мс"
+    )
+
+@router.message(Command("stats"))
+async def send_stats(message: Message, session: AsyncSession):
+    """Статистика заказов из сводных таблиц"""
+    if message.from_user.id != config.ADMIN_ID:
+        await message.answer("❌ Доступ запрещен")
+        return
+    
+    stats = await OrderStatsRepository.get_summary(session)
+    today = stats["today"]
+    days = "\n".join(
+        f"   {day[8:10]}.{day[5:7]}: {orders} шт., {revenue:.0f}₽" for day, (orders, revenue) in stats["days"]
+    ) or "   заказов не было"
+    await message.answer(
+        "📊 Статистика заказов\n\n"
+        f"Всего: {stats['total_orders']} на {stats['total_revenue']:.0f}₽ (без отмененных)\n"
+        f"⏳ Ожидают: {stats['pending_orders']}\n"
+        f"✅ Подтверждены: {stats['confirmed_orders']}\n"
+        f"📦 Выполнены: {stats['completed_orders']}\n"
+        f"❌ Отменены: {stats['cancelled_orders']}\n\n"
+        f"Сегодня: {today['total_orders']} на {today['total_revenue']:.0f}₽\n\n"
+        f"По дням (UTC):\n{days}"
     )
 
 # Здесь будут другие обработчики для админки
@@ -1,19 +1,21 @@
-from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, Update
 from aiogram.fsm.context import FSMContext
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from sqlalchemy.orm import selectinload
 
-from database.models import CartItem
+from database.engine import AsyncSessionLocal
 from database.repository import CartRepository, UserRepository
 from bot.keyboards.cart import get_cart_keyboard
 from bot.keyboards.main_menu import get_main_menu
-from utils.helpers import check_product_availability
+from bot.render_cache import edit_message
+from bot.coalescer import CallbackCoalescer
+from bot.callbacks import (
+    CallbackRouter, IncreaseCallback, DecreaseCallback, RemoveCallback, CartItemCallback, SEPARATOR
+)
+import config
 
-router = Router()
+callbacks = CallbackRouter()
 
-@router.callback_query(F.data == "cart")
+@callbacks.static("cart")
 async def show_cart(callback: CallbackQuery, session: AsyncSession):
     """Показать корзину"""
     user = await UserRepository.get_or_create_user(
@@ -21,16 +23,14 @@ async def show_cart(callback: CallbackQuery, session: AsyncSession):
         telegram_id=callback.from_user.id
     )
     
-    # Используем eager loading для корзины
-    stmt = select(CartItem).options(
-        selectinload(CartItem.product)
-    ).where(CartItem.user_id == user.id)
-    
-    result = await session.execute(stmt)
-    cart_items = result.scalars().all()
-    
-    if not cart_items:
-        await callback.message.edit_text(
+    cart_lines = await CartRepository.get_cart_lines(session, user.id)
+    await render_cart(callback, cart_lines)
+
+async def render_cart(callback: CallbackQuery, cart_lines):
+    """Отрисовать корзину из уже загруженных строк"""
+    if not cart_lines:
+        await edit_message(
+            callback.message,
             "🛒 Ваша корзина пуста\n\n"
             "Добавьте товары из каталога!",
             reply_markup=get_main_menu()
@@ -41,78 +41,87 @@ async def show_cart(callback: CallbackQuery, session: AsyncSession):
     cart_text = "🛒 Ваша корзина:\n\n"
     total = 0
     
-    for item in cart_items:
-        item_total = item.product.price * item.quantity
+    for item in cart_lines:
+        item_total = item.price * item.quantity
         total += item_total
-        status_icon = "✅" if item.product.quantity >= item.quantity else "⚠️"
-        cart_text += f"{status_icon} {item.product.name}\n"
-        cart_text += f"   {item.quantity} шт. x {item.product.price}₽ = {item_total}₽\n\n"
+        status_icon = "✅" if item.stock >= item.quantity else "⚠️"
+        cart_text += f"{status_icon} {item.name}\n"
+        cart_text += f"   {item.quantity} шт. x {item.price}₽ = {item_total}₽\n\n"
     
     cart_text += f"💵 Итого: {total}₽"
     
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         cart_text,
-        reply_markup=get_cart_keyboard(cart_items)
+        reply_markup=get_cart_keyboard(cart_lines)
     )
 
-@router.callback_query(F.data.startswith("add_to_cart_"))
-async def add_to_cart(callback: CallbackQuery, session: AsyncSession):
-    """Добавить товар в корзину"""
-    product_id = int(callback.data.split("_")[3])
-    
-    # Проверяем доступность товара
-    is_available = await check_product_availability(session, product_id)
-    if not is_available:
-        await callback.answer("❌ Товар временно недоступен", show_alert=True)
-        return
+@callbacks.on(IncreaseCallback)
+async def increase_quantity(callback: CallbackQuery, callback_data: IncreaseCallback, session: AsyncSession):
+    """Увеличить количество товара в корзине"""
+    await change_quantity(callback, session, callback_data.item_id, delta=1)
+
+@callbacks.on(DecreaseCallback)
+async def decrease_quantity(callback: CallbackQuery, callback_data: DecreaseCallback, session: AsyncSession):
+    """Уменьшить количество товара в корзине"""
+    await change_quantity(callback, session, callback_data.item_id, delta=-1)
+
+async def change_quantity(callback: CallbackQuery, session: AsyncSession, cart_item_id: int, delta: int):
+    """Отвечает на нажатие сразу, а изменение копит в серии нажатий на этом сообщении"""
+    # "➖" на минимуме ничего не изменит, а количество здесь еще не прочитано - без текста
+    await callback.answer("✅ Количество увеличено" if delta > 0 else None)
     
     user = await UserRepository.get_or_create_user(
         session=session,
         telegram_id=callback.from_user.id
     )
     
-    # Добавляем в корзину
-    await CartRepository.add_to_cart(session, user.id, product_id)
-    
-    await callback.answer("✅ Товар добавлен в корзину!")
+    key = (callback.message.chat.id, callback.message.message_id)
+    quantity_coalescer.submit(key, callback, user.id, cart_item_id, delta)
 
-@router.callback_query(F.data.startswith("increase_"))
-async def increase_quantity(callback: CallbackQuery, session: AsyncSession):
-    """Увеличить количество товара в корзине"""
-    cart_item_id = int(callback.data.split("_")[1])
+async def apply_quantity_changes(callback: CallbackQuery, user_id: int, deltas: dict[int, int]):
+    """Одно изменение корзины и одна перерисовка на всю серию нажатий"""
+    # Сессия обработчика к этому моменту уже закрыта - берем свою
+    async with AsyncSessionLocal() as session:
+        cart_lines = await CartRepository.change_quantities(session, user_id, deltas)
     
-    # Находим товар в корзине
-    cart_item = await session.get(CartItem, cart_item_id)
-    if cart_item:
-        cart_item.quantity += 1
-        await session.commit()
-        await callback.answer("✅ Количество увеличено")
-    await show_cart(callback, session)
+    # Серия "➖" на минимуме ничего не меняет - такую перерисовку отсечет render_cache
+    await render_cart(callback, cart_lines)
 
-@router.callback_query(F.data.startswith("decrease_"))
-async def decrease_quantity(callback: CallbackQuery, session: AsyncSession):
-    """Уменьшить количество товара в корзине"""
-    cart_item_id = int(callback.data.split("_")[1])
-    
-    # Находим товар в корзине
-    cart_item = await session.get(CartItem, cart_item_id)
-    if cart_item:
-        if cart_item.quantity > 1:
-            cart_item.quantity -= 1
-            await session.commit()
-            await callback.answer("✅ Количество уменьшено")
-        else:
-            await callback.answer("❌ Нельзя уменьшить меньше 1", show_alert=True)
-    await show_cart(callback, session)
+quantity_coalescer = CallbackCoalescer(config.CART_COALESCE_WINDOW, apply_quantity_changes)
+
+QUANTITY_TAP_PREFIXES = tuple(
+    schema.__prefix__ + SEPARATOR for schema in (IncreaseCallback, DecreaseCallback)
+)
+
+async def settle_quantity_taps(update: Update, telegram_id: int):
+    """Барьер очереди пользователя: серия ➕/➖ применяется до любого другого его обновления
 
-@router.callback_query(F.data.startswith("remove_"))
-async def remove_from_cart(callback: CallbackQuery, session: AsyncSession):
+    Иначе перерисовка корзины по окончании окна затрет экран, который успела показать,
+    например, кнопка "Оформить заказ". Сами нажатия ➕/➖ серию не прерывают.
+    """
+    callback = update.callback_query
+    if callback is not None and (callback.data or "").startswith(QUANTITY_TAP_PREFIXES):
+        return
+    await quantity_coalescer.settle(telegram_id)
+
+@callbacks.on(RemoveCallback)
+async def remove_from_cart(callback: CallbackQuery, callback_data: RemoveCallback, session: AsyncSession):
     """Удалить товар из корзины"""
-    cart_item_id = int(callback.data.split("_")[1])
+    cart_item_id = callback_data.item_id
+    
+    user = await UserRepository.get_or_create_user(
+        session=session,
+        telegram_id=callback.from_user.id
+    )
     
     # Удаляем товар из корзины
-    await session.execute(delete(CartItem).where(CartItem.id == cart_item_id))
-    await session.commit()
+    await CartRepository.remove_item(session, user.id, cart_item_id)
     
     await callback.answer("🗑️ Товар удален из корзины")
-    await show_cart(callback, session)
\ No newline at end of file
+    await show_cart(callback, session)
+
+@callbacks.on(CartItemCallback)
+async def show_cart_item(callback: CallbackQuery):
+    """Кнопка с названием позиции - только подпись"""
+    await callback.answer()
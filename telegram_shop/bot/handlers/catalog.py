@@ -1,58 +1,50 @@
-from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
-from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from database.repository import UserRepository, CartRepository  # 🆕 ДОБАВИТЬ ЭТИ ИМПОРТЫ
-from database.models import Category, Brand, Product
+from database.repository import UserRepository, CartRepository
+from database.catalog import catalog_store
 from utils.states import OrderStates
 from bot.keyboards.catalog import (
     get_categories_keyboard, get_brands_keyboard,
     get_products_keyboard, get_product_detail_keyboard
 )
 from bot.keyboards.main_menu import get_main_menu
+from bot.render_cache import edit_message
+from bot.callbacks import CallbackRouter, CategoryCallback, BrandCallback, ProductCallback, AddToCartCallback
 from utils.helpers import get_product_status_text
 
-router = Router()
+callbacks = CallbackRouter()
 
-@router.callback_query(F.data == "catalog")
+@callbacks.static("catalog")
 async def show_categories(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
     """Показать категории"""
-    # Получаем активные категории
-    result = await session.scalars(
-        select(Category).where(Category.is_active == True)
-    )
-    categories = result.all()
+    # Каталог отвечает из снимка в памяти; база нужна, только пока снимок не построен
+    catalog = await catalog_store.current(session)
+    categories = catalog.categories
     
     if not categories:
-        await callback.message.edit_text(
+        await edit_message(
+            callback.message,
             "📦 Категории временно недоступны",
             reply_markup=get_main_menu()
         )
         return
     
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         "📁 Выберите категорию:",
-        reply_markup=get_categories_keyboard(categories)
+        reply_markup=get_categories_keyboard(categories, version=catalog.version)
     )
     await state.set_state(OrderStates.catalog)
 
-@router.callback_query(F.data.startswith("category_"))
-async def show_brands(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
+@callbacks.on(CategoryCallback)
+async def show_brands(callback: CallbackQuery, callback_data: CategoryCallback, session: AsyncSession, state: FSMContext):
     """Показать бренды по категории"""
-    category_id = int(callback.data.split("_")[1])
-    
-    # 🆕 ИСПРАВЛЕННЫЙ ЗАПРОС: получаем бренды, у которых есть товары в этой категории
-    result = await session.scalars(
-        select(Brand)
-        .join(Product, Brand.id == Product.brand_id)
-        .where(Product.category_id == category_id)
-        .where(Product.is_active == True)
-        .where(Brand.is_active == True)
-        .distinct()
-    )
-    brands = result.all()
+    category_id = callback_data.id
+    
+    # Бренды, у которых есть товары в этой категории
+    catalog = await catalog_store.current(session)
+    brands = catalog.get_brands(category_id)
     
     if not brands:
         await callback.answer("❌ В этой категории пока нет товаров", show_alert=True)
@@ -60,29 +52,24 @@ async def show_brands(callback: CallbackQuery, session: AsyncSession, state: FSM
         await show_categories(callback, session, state)
         return
     
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         "🏷️ Выберите производителя:",
-        reply_markup=get_brands_keyboard(brands, f"category_{category_id}")
+        reply_markup=get_brands_keyboard(brands, f"category_{category_id}", version=catalog.version)
     )
     await state.set_state(OrderStates.liquid_brands)
 
-@router.callback_query(F.data.startswith("brand_"))
-async def show_products(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
+@callbacks.on(BrandCallback)
+async def show_products(callback: CallbackQuery, callback_data: BrandCallback, session: AsyncSession, state: FSMContext):
     """Показать товары бренда"""
-    brand_id = int(callback.data.split("_")[1])
+    brand_id = callback_data.id
     
     # Получаем данные из state чтобы узнать category_id
     state_data = await state.get_data()
     
-    # 🆕 ИСПРАВЛЕННЫЙ ЗАПРОС: получаем товары бренда в текущей категории
-    result = await session.scalars(
-        select(Product)
-        .where(Product.brand_id == brand_id)
-        .where(Product.is_active == True)
-        .where(Product.quantity > 0)
-        .order_by(Product.name)
-    )
-    products = result.all()
+    # Товары бренда в наличии
+    catalog = await catalog_store.current(session)
+    products = catalog.get_products(brand_id)
     
     if not products:
         await callback.answer("❌ У этого производителя пока нет товаров в наличии", show_alert=True)
@@ -90,25 +77,20 @@ async def show_products(callback: CallbackQuery, session: AsyncSession, state: F
         await show_categories(callback, session, state)
         return
     
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         "🛍️ Выберите товар:",
-        reply_markup=get_products_keyboard(products, f"brand_{brand_id}")
+        reply_markup=get_products_keyboard(products, f"brand_{brand_id}", version=catalog.version)
     )
     await state.set_state(OrderStates.liquid_products)
 
-@router.callback_query(F.data.startswith("product_"))
-async def show_product_detail(callback: CallbackQuery, session: AsyncSession):
+@callbacks.on(ProductCallback)
+async def show_product_detail(callback: CallbackQuery, callback_data: ProductCallback, session: AsyncSession):
     """Показать детали товара"""
-    product_id = int(callback.data.split("_")[1])
-    
-    # Используем eager loading чтобы избежать проблем с lazy loading
-    stmt = select(Product).options(
-        selectinload(Product.brand),
-        selectinload(Product.category)
-    ).where(Product.id == product_id)
+    product_id = callback_data.id
     
-    result = await session.execute(stmt)
-    product = result.scalar_one_or_none()
+    catalog = await catalog_store.current(session)
+    product = catalog.get_product(product_id)
     
     if not product:
         await callback.answer("❌ Товар не найден", show_alert=True)
@@ -118,22 +100,23 @@ async def show_product_detail(callback: CallbackQuery, session: AsyncSession):
     
     product_text = (
         f"🛍️ {product.name}\n"
-        f"🏷️ {product.brand.name}\n"
-        f"📁 {product.category.name}\n\n"
+        f"🏷️ {product.brand_name}\n"
+        f"📁 {product.category_name}\n\n"
         f"{product.description or 'Описание отсутствует'}\n\n"
         f"💵 Цена: {product.price}₽\n"
         f"📦 {status_text}"
     )
     
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         product_text,
-        reply_markup=get_product_detail_keyboard(product_id, f"brand_{product.brand.id}")
+        reply_markup=get_product_detail_keyboard(product_id, f"brand_{product.brand_id}")
     )
 
-@router.callback_query(F.data.startswith("add_to_cart_"))
-async def add_to_cart(callback: CallbackQuery, session: AsyncSession):
+@callbacks.on(AddToCartCallback)
+async def add_to_cart(callback: CallbackQuery, callback_data: AddToCartCallback, session: AsyncSession):
     """Добавить товар в корзину и показать корзину"""
-    product_id = int(callback.data.split("_")[3])
+    product_id = callback_data.product_id
     
     # Проверяем доступность товара
     from utils.helpers import check_product_availability
@@ -156,17 +139,17 @@ async def add_to_cart(callback: CallbackQuery, session: AsyncSession):
     from bot.handlers.cart import show_cart
     await show_cart(callback, session)
 
-@router.callback_query(F.data == "back_to_products")
-async def back_to_products(callback: CallbackQuery, session: AsyncSession):
+@callbacks.static("back_to_products")
+async def back_to_products(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
     """Возврат к списку товаров"""
-    await show_categories(callback, session, None)
+    await show_categories(callback, session, state)
 
-@router.callback_query(F.data == "back_to_brands")
+@callbacks.static("back_to_brands")
 async def back_to_brands(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
     """Возврат к списку брендов"""
     await show_categories(callback, session, state)
 
-@router.callback_query(F.data == "back_to_catalog")
+@callbacks.static("back_to_catalog")
 async def back_to_catalog(callback: CallbackQuery, session: AsyncSession, state: FSMContext):
     """Возврат в каталог"""
     await show_categories(callback, session, state)
\ No newline at end of file
@@ -1,13 +1,16 @@
-from aiogram import Router, F, Bot
+from typing import Optional
+
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
 from aiogram.filters import StateFilter
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload  # 🆕 ДОБАВИТЬ ЭТОТ ИМПОРТ
 
-from database.models import Order, OrderItem, User, Product, CartItem
-from database.repository import UserRepository, CartRepository
+from database.models import Order
+from database.repository import (
+    UserRepository, CartRepository, OrderRepository, ReservationRepository, OutboxRepository,
+    InsufficientStockError
+)
+from database.dto import UserIdentity
 from utils.states import OrderStates
 from bot.keyboards.cart import (
     get_checkout_confirm_keyboard,
@@ -17,12 +20,15 @@ from bot.keyboards.cart import (
     get_back_to_checkout_keyboard
 )
 from bot.keyboards.main_menu import get_main_menu
+from bot.render_cache import edit_message
+from bot.notifications import wake_outbox_sender
+from bot.callbacks import CallbackRouter, PickupCallback, DateCallback, PaymentCallback
 
 import config
 
-router = Router()
+callbacks = CallbackRouter()
 
-@router.callback_query(F.data == "checkout")
+@callbacks.static("checkout")
 async def start_checkout(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Начало оформления заказа - сразу выбор пункта выдачи"""
     # Проверяем что корзина не пуста
@@ -31,15 +37,23 @@ async def start_checkout(callback: CallbackQuery, state: FSMContext, session: As
         telegram_id=callback.from_user.id
     )
     
-    cart_items = await CartRepository.get_cart_items(session, user.id)
-    if not cart_items:
-        await callback.message.edit_text(
+    # Резервируем товары корзины на время оформления
+    try:
+        cart_lines = await ReservationRepository.hold_cart(session, user.id)
+    except InsufficientStockError as e:
+        await callback.answer(f"❌ Недостаточно товара на складе: {e}", show_alert=True)
+        return
+    
+    if not cart_lines:
+        await edit_message(
+            callback.message,
             "🛒 Ваша корзина пуста!\n\nДобавьте товары из каталога перед оформлением заказа.",
             reply_markup=get_main_menu()
         )
         return
     
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         "🚚 Выберите пункт выдачи:\n\n"
         "🏢 3-е общежитие ВГТУ\n"
         "🏠 ул.Терешковой 16к1",
@@ -47,10 +61,11 @@ async def start_checkout(callback: CallbackQuery, state: FSMContext, session: As
     )
     await state.set_state(OrderStates.checkout_delivery_method)
 
-@router.callback_query(F.data.startswith("pickup_"))
-async def process_delivery_method(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+@callbacks.on(PickupCallback)
+async def process_delivery_method(callback: CallbackQuery, callback_data: PickupCallback, state: FSMContext,
+                                  session: AsyncSession):
     """Обработка выбора пункта выдачи"""
-    if "vgtu" in callback.data:
+    if callback_data.point == "vgtu":
         delivery_address = "3-е общежитие ВГТУ"
     else:
         delivery_address = "ул.Терешковой 16к1"
@@ -61,35 +76,38 @@ async def process_delivery_method(callback: CallbackQuery, state: FSMContext, se
         customer_name="Клиент"  # Автоматическое имя
     )
     
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         "📅 Выберите дату получения заказа (доступны только будние дни):",
         reply_markup=get_dates_keyboard()
     )
     await state.set_state(OrderStates.checkout_date)
 
-@router.callback_query(F.data.startswith("date_"))
-async def process_date(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+@callbacks.on(DateCallback)
+async def process_date(callback: CallbackQuery, callback_data: DateCallback, state: FSMContext, session: AsyncSession):
     """Обработка даты доставки"""
-    delivery_date = callback.data.split("_")[1]
+    delivery_date = callback_data.value
     await state.update_data(delivery_date=delivery_date)
     
     # Автоматически устанавливаем время
     await state.update_data(delivery_time="16:00-18:00")
     
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         "💳 Выберите способ оплата:",
         reply_markup=get_payment_method_keyboard()
     )
     await state.set_state(OrderStates.checkout_payment)
 
-@router.callback_query(F.data.startswith("payment_"))
-async def process_payment_method(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+@callbacks.on(PaymentCallback)
+async def process_payment_method(callback: CallbackQuery, callback_data: PaymentCallback, state: FSMContext,
+                                 session: AsyncSession):
     """Обработка способа оплаты"""
-    if "disabled" in callback.data:
+    if callback_data.method == "card_disabled":
         await callback.answer("❌ Оплата картой временно недоступна", show_alert=True)
         return
     
-    payment_method = "cash" if "cash" in callback.data else "card"
+    payment_method = callback_data.method
     await state.update_data(payment_method=payment_method)
     
     # Автоматически устанавливаем примечание
@@ -98,16 +116,22 @@ async def process_payment_method(callback: CallbackQuery, state: FSMContext, ses
     # Показываем подтверждение заказа
     await show_order_confirmation(callback, state, session)
 
-@router.callback_query(F.data == "edit_checkout")
+@callbacks.static("edit_checkout")
 async def edit_checkout(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Редактирование данных заказа"""
     await start_checkout(callback, state, session)
 
-@router.callback_query(F.data == "cancel_order")
-async def cancel_order(callback: CallbackQuery, state: FSMContext):
+@callbacks.static("cancel_order")
+async def cancel_order(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Отмена заказа"""
+    user = await UserRepository.get_or_create_user(
+        session=session,
+        telegram_id=callback.from_user.id
+    )
+    await ReservationRepository.release_user_holds(session, user.id)
     await state.clear()
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         "❌ Заказ отменен",
         reply_markup=get_main_menu()
     )
@@ -121,23 +145,19 @@ async def show_order_confirmation(callback: CallbackQuery, state: FSMContext, se
         telegram_id=callback.from_user.id
     )
     
-    # Получаем cart_items с продуктами
-    stmt = select(CartItem).options(
-        selectinload(CartItem.product)
-    ).where(CartItem.user_id == user.id)
+    # Строки корзины с ценами товаров одним готовым запросом
+    cart_lines = await CartRepository.get_cart_lines(session, user.id)
     
-    result = await session.execute(stmt)
-    cart_items = result.scalars().all()
-    
-    if not cart_items:
-        await callback.message.edit_text(
+    if not cart_lines:
+        await edit_message(
+            callback.message,
             "🛒 Ваша корзина пуста!\n\nДобавьте товары из каталога перед оформлением заказа.",
             reply_markup=get_main_menu()
         )
         return
     
     # Рассчитываем итоговую сумму
-    total_amount = sum(item.product.price * item.quantity for item in cart_items)
+    total_amount = sum(line.price * line.quantity for line in cart_lines)
     
     # Формируем текст заказа для подтверждения
     order_text = (
@@ -150,21 +170,23 @@ async def show_order_confirmation(callback: CallbackQuery, state: FSMContext, se
     )
     
     order_text += "🛒 СОСТАВ ЗАКАЗА:\n"
-    for item in cart_items:
-        item_total = item.product.price * item.quantity
-        order_text += f"   • {item.product.name}\n"
-        order_text += f"     {item.quantity} шт. × {item.product.price}₽ = {item_total}₽\n"
+    for line in cart_lines:
+        item_total = line.price * line.quantity
+        order_text += f"   • {line.name}\n"
+        order_text += f"     {line.quantity} шт. × {line.price}₽ = {item_total}₽\n"
     
     order_text += f"\n💵 ИТОГО: {total_amount}₽"
     
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         order_text,
         reply_markup=get_checkout_confirm_keyboard()
     )
+    await state.set_state(OrderStates.checkout_confirm)
 
-async def send_admin_notification(bot: Bot, order: Order, user: User, order_items_text: str):
-    """Отправка уведомления администратору"""
-    admin_message = (
+def build_admin_notification(order: Order, user: UserIdentity, order_items_text: str) -> str:
+    """Текст уведомления администратору о новом заказе"""
+    return (
         "🆕 НОВЫЙ ЗАКАЗ!\n\n"
         f"📦 Номер заказа: #{order.id}\n"
         f"👤 Клиент: {user.first_name or ''} {user.last_name or ''} (@{user.username or 'без username'})\n"
@@ -177,15 +199,19 @@ async def send_admin_notification(bot: Bot, order: Order, user: User, order_item
         f"🛒 Состав заказа:\n{order_items_text}\n\n"
         "⚡ Перейдите в админ-панель для управления заказом"
     )
-    
-    try:
-        await bot.send_message(chat_id=config.ADMIN_ID, text=admin_message)
-    except Exception as e:
-        print(f"❌ Ошибка отправки уведомления админу: {e}")
 
-@router.callback_query(F.data == "confirm_order")
-async def confirm_order(callback: CallbackQuery, state: FSMContext, session: AsyncSession, bot: Bot):
-    """Подтверждение и создание заказа"""
+@callbacks.static("confirm_order")
+async def confirm_order(callback: CallbackQuery, state: FSMContext, raw_state: Optional[str],
+                        session: AsyncSession):
+    """Подтверждение и создание заказа
+
+    Повторное нажатие (у него другой id callback-запроса) приходит в очередь пользователя
+    после первого: к этому моменту шаг FSM уже сброшен, а корзина пуста - заказ не дублируется.
+    """
+    if raw_state != OrderStates.checkout_confirm.state:
+        await callback.answer("⚠️ Заказ уже оформлен или подтверждение устарело", show_alert=True)
+        return
+    
     try:
         order_data = await state.get_data()
         
@@ -197,71 +223,38 @@ async def confirm_order(callback: CallbackQuery, state: FSMContext, session: Asy
             last_name=callback.from_user.last_name
         )
         
-        # Получаем cart_items с продуктами
-        stmt = select(CartItem).options(
-            selectinload(CartItem.product)
-        ).where(CartItem.user_id == user.id)
-        
-        result = await session.execute(stmt)
-        cart_items = result.scalars().all()
+        # Списание остатков, позиции заказа и очистка корзины - одной транзакцией
+        try:
+            created = await OrderRepository.create_order_from_cart(session, user.id, order_data, commit=False)
+        except InsufficientStockError as e:
+            await callback.answer(f"❌ Недостаточно товара на складе: {e}", show_alert=True)
+            return
         
-        if not cart_items:
+        if created is None:
             await callback.answer("❌ Корзина пуста!", show_alert=True)
             return
         
-        # Рассчитываем итоговую сумму
-        total_amount = sum(item.product.price * item.quantity for item in cart_items)
-        
-        # Создаем заказ (БЕЗ updated_at)
-        order = Order(
-            user_id=user.id,
-            total_amount=total_amount,
-            customer_name=order_data['customer_name'],
-            delivery_method=order_data['delivery_method'],
-            delivery_address=order_data['delivery_address'],
-            delivery_date=order_data['delivery_date'],
-            delivery_time=order_data['delivery_time'],
-            payment_method=order_data['payment_method'],
-            notes=order_data.get('notes', ''),
-            status='pending'
-        )
-        session.add(order)
-        await session.flush()  # Используем flush вместо commit чтобы получить ID
+        order, cart_lines = created
         
         # Формируем текст товаров для уведомления
         order_items_text = ""
-        for cart_item in cart_items:
-            item_total = cart_item.product.price * cart_item.quantity
-            order_items_text += f"   • {cart_item.product.name}\n"
-            order_items_text += f"     {cart_item.quantity} шт. × {cart_item.product.price}₽ = {item_total}₽\n"
-            
-            # Добавляем товары в заказ
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=cart_item.product.id,
-                product_name=cart_item.product.name,
-                product_price=cart_item.product.price,
-                quantity=cart_item.quantity
-            )
-            session.add(order_item)
-            
-            # Обновляем количество товара
-            product = await session.get(Product, cart_item.product.id)
-            if product:
-                product.quantity = max(0, product.quantity - cart_item.quantity)
+        for line in cart_lines:
+            item_total = line.price * line.quantity
+            order_items_text += f"   • {line.name}\n"
+            order_items_text += f"     {line.quantity} шт. × {line.price}₽ = {item_total}₽\n"
         
-        # Очищаем корзину
-        for cart_item in cart_items:
-            await session.delete(cart_item)
-        
-        await session.commit()  # Один коммит в конце
+        # Уведомление администратору пишем в outbox в той же транзакции, отправит его фоновая задача
+        if config.ADMIN_ID:
+            OutboxRepository.enqueue(
+                session, config.ADMIN_ID, build_admin_notification(order, user, order_items_text)
+            )
+        await session.commit()
+        wake_outbox_sender()
         
         await state.clear()
         
-        # Отправляем уведомление администратору
-        await send_admin_notification(bot, order, user, order_items_text)
-        
-        await callback.message.edit_text(
+        await edit_message(
+            callback.message,
             "✅ Заказ успешно оформлен!\n\n"
             f"📦 Номер вашего заказа: #{order.id}\n"
             f"📍 Пункт выдачи: {order_data['delivery_address']}\n"
@@ -276,21 +269,23 @@ async def confirm_order(callback: CallbackQuery, state: FSMContext, session: Asy
     except Exception as e:
         print(f"❌ Ошибка при создании заказа: {e}")
         await session.rollback()  # Откатываем изменения при ошибке
-        await callback.message.edit_text(
+        await edit_message(
+            callback.message,
             "❌ Произошла ошибка при оформлении заказа. Попробуйте позже.",
             reply_markup=get_main_menu()
         )
 
 # Обработчики для кнопок "Назад"
-@router.callback_query(F.data == "checkout_delivery")
+@callbacks.static("checkout_delivery")
 async def back_to_delivery(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Возврат к выбору доставки"""
     await start_checkout(callback, state, session)
 
-@router.callback_query(F.data == "checkout_payment")
+@callbacks.static("checkout_payment")
 async def back_to_payment(callback: CallbackQuery, state: FSMContext):
     """Возврат к выбору оплаты"""
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         "💳 Выберите способ оплаты:",
         reply_markup=get_payment_method_keyboard()
     )
@@ -1,14 +1,15 @@
-from aiogram import Router, F
+from aiogram import Router
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import CommandStart, Command
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import delete
 
-from database.models import CartItem
-from database.repository import UserRepository
+from database.repository import UserRepository, CartRepository, ReservationRepository
 from bot.keyboards.main_menu import get_main_menu
+from bot.render_cache import edit_message
+from bot.callbacks import CallbackRouter
 
 router = Router()
+callbacks = CallbackRouter()
 
 @router.message(CommandStart())
 async def cmd_start(message: Message, session: AsyncSession):
@@ -23,8 +24,8 @@ async def cmd_start(message: Message, session: AsyncSession):
     )
     
     # ОЧИСТКА КОРЗИНЫ ПРИ КАЖДОМ СТАРТЕ
-    await session.execute(delete(CartItem).where(CartItem.user_id == user.id))
-    await session.commit()
+    await ReservationRepository.release_user_holds(session, user.id, commit=False)
+    await CartRepository.clear(session, user.id)
     
     await message.answer(
         "🏪 Добро пожаловать в наш магазин!\n\n"
@@ -33,18 +34,20 @@ async def cmd_start(message: Message, session: AsyncSession):
         reply_markup=get_main_menu()
     )
 
-@router.callback_query(F.data == "main_menu")
+@callbacks.static("main_menu")
 async def back_to_main(callback: CallbackQuery):
     """Возврат в главное меню"""
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         "🏪 Главное меню\n\nВыберите действие:",
         reply_markup=get_main_menu()
     )
 
-@router.callback_query(F.data == "about")
+@callbacks.static("about")
 async def about_shop(callback: CallbackQuery):
     """Информация о магазине"""
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         "🏪 О нашем магазине\n\n"
         "• Быстрая доставка\n"
         "• Качественные товары\n"
@@ -54,10 +57,11 @@ async def about_shop(callback: CallbackQuery):
         reply_markup=get_main_menu()
     )
 
-@router.callback_query(F.data == "contact_seller")
+@callbacks.static("contact_seller")
 async def contact_seller(callback: CallbackQuery):
     """Связь с продавцом"""
-    await callback.message.edit_text(
+    await edit_message(
+        callback.message,
         "📞 Связь с продавцом\n\n"
         "Для связи с менеджером:\n"
         "• Напишите нам в личные сообщения @mefidiu\n"
@@ -1,17 +1,28 @@
+from datetime import date, timedelta
+from functools import lru_cache
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
+from bot.callbacks import (
+    IncreaseCallback, DecreaseCallback, RemoveCallback, CartItemCallback,
+    PickupCallback, PaymentCallback, DateCallback
+)
+
 def get_cart_keyboard(cart_items):
-    """Клавиатура корзины"""
+    """Клавиатура корзины (строки CartLine)"""
     keyboard = []
     
     for item in cart_items:
         keyboard.extend([
             [
-                InlineKeyboardButton(text="➖", callback_data=f"decrease_{item.id}"),
-                InlineKeyboardButton(text=f"{item.product.name} ({item.quantity} шт.)", callback_data=f"item_{item.id}"),
-                InlineKeyboardButton(text="➕", callback_data=f"increase_{item.id}")
+                InlineKeyboardButton(text="➖", callback_data=DecreaseCallback(item_id=item.id).pack()),
+                InlineKeyboardButton(
+                    text=f"{item.name} ({item.quantity} шт.)",
+                    callback_data=CartItemCallback(item_id=item.id).pack()
+                ),
+                InlineKeyboardButton(text="➕", callback_data=IncreaseCallback(item_id=item.id).pack())
             ],
-            [InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"remove_{item.id}")]
+            [InlineKeyboardButton(text="🗑️ Удалить", callback_data=RemoveCallback(item_id=item.id).pack())]
         ])
     
     if cart_items:
@@ -23,40 +34,51 @@ def get_cart_keyboard(cart_items):
     
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
+CHECKOUT_CONFIRM = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="✅ Подтвердить заказ", callback_data="confirm_order")],
+    [InlineKeyboardButton(text="✏️ Изменить данные", callback_data="edit_checkout")],
+    [InlineKeyboardButton(text="❌ Отменить заказ", callback_data="cancel_order")],
+    [InlineKeyboardButton(text="🔙 В корзину", callback_data="cart")]
+])
+
+DELIVERY_METHOD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="🏢 3-е общежитие ВГТУ", callback_data=PickupCallback(point="vgtu").pack())],
+    [InlineKeyboardButton(text="🏠 ул.Терешковой 16к1", callback_data=PickupCallback(point="tereshkovoy").pack())],
+    [InlineKeyboardButton(text="🔙 Назад", callback_data="checkout")]
+])
+
+PAYMENT_METHOD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="💵 Наличные при получении", callback_data=PaymentCallback(method="cash").pack())],
+    [InlineKeyboardButton(text="💳 Карта (скоро)", callback_data=PaymentCallback(method="card_disabled").pack())],
+    [InlineKeyboardButton(text="🔙 Назад", callback_data="checkout_delivery")]
+])
+
+BACK_TO_CHECKOUT = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text="🔙 Вернуться к оформлению", callback_data="checkout")]
+])
+
+WEEKDAYS = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"]
+
 def get_checkout_confirm_keyboard():
     """Подтверждение оформления заказа"""
-    keyboard = [
-        [InlineKeyboardButton(text="✅ Подтвердить заказ", callback_data="confirm_order")],
-        [InlineKeyboardButton(text="✏️ Изменить данные", callback_data="edit_checkout")],
-        [InlineKeyboardButton(text="❌ Отменить заказ", callback_data="cancel_order")],
-        [InlineKeyboardButton(text="🔙 В корзину", callback_data="cart")]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+    return CHECKOUT_CONFIRM
 
 def get_delivery_method_keyboard():
     """Выбор способа доставки - только самовывоз"""
-    keyboard = [
-        [InlineKeyboardButton(text="🏢 3-е общежитие ВГТУ", callback_data="pickup_vgtu")],
-        [InlineKeyboardButton(text="🏠 ул.Терешковой 16к1", callback_data="pickup_tereshkovoy")],
-        [InlineKeyboardButton(text="🔙 Назад", callback_data="checkout")]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+    return DELIVERY_METHOD
 
 def get_payment_method_keyboard():
     """Выбор способа оплаты - наличные и карта (недоступно)"""
-    keyboard = [
-        [InlineKeyboardButton(text="💵 Наличные при получении", callback_data="payment_cash")],
-        [InlineKeyboardButton(text="💳 Карта (скоро)", callback_data="payment_card_disabled")],
-        [InlineKeyboardButton(text="🔙 Назад", callback_data="checkout_delivery")]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+    return PAYMENT_METHOD
 
 def get_dates_keyboard():
     """Клавиатура с датами на текущей неделе (без выходных)"""
-    from datetime import datetime, timedelta
-    
+    return build_dates_keyboard(date.today())
+
+@lru_cache(maxsize=2)
+def build_dates_keyboard(today: date):
+    """Клавиатура дат от указанного дня, кэшируется на календарный день"""
     keyboard = []
-    today = datetime.now()
     
     # Добавляем даты на 7 дней вперед, пропуская выходные
     for i in range(7):
@@ -64,11 +86,11 @@ def get_dates_keyboard():
         # Пропускаем субботу (5) и воскресенье (6)
         if current_date.weekday() not in [5, 6]:
             date_str = current_date.strftime("%d.%m.%Y")
-            weekday = ["Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс"][current_date.weekday()]
+            weekday = WEEKDAYS[current_date.weekday()]
             keyboard.append([
                 InlineKeyboardButton(
                     text=f"{weekday} {date_str}",
-                    callback_data=f"date_{date_str}"
+                    callback_data=DateCallback(value=date_str).pack()
                 )
             ])
     
@@ -77,7 +99,4 @@ def get_dates_keyboard():
 
 def get_back_to_checkout_keyboard():
     """Кнопка возврата к оформлению заказа"""
-    keyboard = [
-        [InlineKeyboardButton(text="🔙 Вернуться к оформлению", callback_data="checkout")]
-    ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
\ No newline at end of file
+    return BACK_TO_CHECKOUT
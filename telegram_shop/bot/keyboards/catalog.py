@@ -1,35 +1,65 @@
+from functools import lru_cache
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
-def get_categories_keyboard(categories):
+from bot.callbacks import CategoryCallback, BrandCallback, ProductCallback, AddToCartCallback
+from utils.cache import TTLCache
+
+# Клавиатуры из данных каталога: ключ - версия каталога и id строк
+keyboard_cache = TTLCache(maxsize=512)
+
+def _memoized(kind: str, version, rows, build):
+    """Берет клавиатуру из кэша, если известна версия каталога, иначе собирает заново"""
+    if version is None:
+        return build(rows)
+
+    key = (kind, version, tuple(row.id for row in rows))
+    keyboard = keyboard_cache.get(key)
+    if keyboard is None:
+        keyboard = build(rows)
+        keyboard_cache.set(key, keyboard)
+    return keyboard
+
+def get_categories_keyboard(categories, version=None):
     """Клавиатура категорий"""
+    return _memoized("categories", version, categories, build_categories_keyboard)
+
+def get_brands_keyboard(brands, back_to="catalog", version=None):
+    """Клавиатура брендов"""
+    return _memoized("brands", version, brands, build_brands_keyboard)
+
+def get_products_keyboard(products, back_to="brands", version=None):
+    """Клавиатура товаров"""
+    return _memoized("products", version, products, build_products_keyboard)
+
+def build_categories_keyboard(categories):
     keyboard = []
     for category in categories:
         keyboard.append([
             InlineKeyboardButton(
                 text=f"📁 {category.name}",
-                callback_data=f"category_{category.id}"
+                callback_data=CategoryCallback(id=category.id).pack()
             )
         ])
-    
+
     keyboard.append([InlineKeyboardButton(text="🔙 На главную", callback_data="main_menu")])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-def get_brands_keyboard(brands, back_to="catalog"):
-    """Клавиатура брендов"""
+def build_brands_keyboard(brands):
     keyboard = []
     for brand in brands:
         keyboard.append([
             InlineKeyboardButton(
                 text=f"🏷️ {brand.name}",
-                callback_data=f"brand_{brand.id}"
+                callback_data=BrandCallback(id=brand.id).pack()
             )
         ])
-    
+
     keyboard.append([InlineKeyboardButton(text="🔙 Назад", callback_data="catalog")])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
-def get_products_keyboard(products, back_to="brands"):
-    """Клавиатура товаров"""
+def build_products_keyboard(products):
+    """Кнопки из строк ProductRow"""
     keyboard = []
     for product in products:
         # Используем только quantity
@@ -39,21 +69,22 @@ def get_products_keyboard(products, back_to="brands"):
             status_icon = "⚠️"
         else:
             status_icon = "✅"
-            
+
         keyboard.append([
             InlineKeyboardButton(
                 text=f"{status_icon} {product.name} - {product.price}₽",
-                callback_data=f"product_{product.id}"
+                callback_data=ProductCallback(id=product.id).pack()
             )
         ])
-    
+
     keyboard.append([InlineKeyboardButton(text="🔙 Назад", callback_data="catalog")])
     return InlineKeyboardMarkup(inline_keyboard=keyboard)
 
+@lru_cache(maxsize=1024)
 def get_product_detail_keyboard(product_id, back_to="products"):
     """Клавиатура для детальной страницы товара"""
     keyboard = [
-        [InlineKeyboardButton(text="➕ Добавить в корзину", callback_data=f"add_to_cart_{product_id}")],
+        [InlineKeyboardButton(text="➕ Добавить в корзину", callback_data=AddToCartCallback(product_id=product_id).pack())],
         [InlineKeyboardButton(text="🔙 Назад", callback_data="catalog")]
     ]
-    return InlineKeyboardMarkup(inline_keyboard=keyboard)
\ No newline at end of file
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
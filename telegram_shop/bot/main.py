@@ -1,37 +1,72 @@
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from bot.middlewares.database import DatabaseMiddleware
+from bot.middlewares.rate_limit import send_scheduler
+from bot.middlewares.lanes import UserLaneMiddleware
+from bot.fsm_storage import fsm_storage
 import config
 from database.engine import init_db
+from bot.background import start_background_tasks, stop_background_tasks
+from bot.webhook import run_webhook
 
 # Импортируем роутеры напрямую
-from bot.handlers.start import router as start_router
-from bot.handlers.catalog import router as catalog_router
-from bot.handlers.cart import router as cart_router
-from bot.handlers.order import router as order_router
+from bot.handlers.start import router as start_router, callbacks as start_callbacks
+from bot.handlers.catalog import callbacks as catalog_callbacks
+from bot.handlers.cart import callbacks as cart_callbacks, settle_quantity_taps, quantity_coalescer
+from bot.handlers.order import callbacks as order_callbacks
 from bot.handlers.admin import router as admin_router
+from bot.callbacks import compile_callback_router
 
 async def setup_bot():
     """Настройка и запуск бота"""
-    bot = Bot(token=config.BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+    session = None
+    if config.TELEGRAM_API_URL:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+    bot = Bot(token=config.BOT_TOKEN, session=session)
+    # Все исходящие запросы проходят через планировщик с лимитами Telegram
+    bot.session.middleware(send_scheduler)
+    dp = Dispatcher(storage=fsm_storage)
+    
+    # Обновления одного пользователя - по очереди, разных - параллельно; дубли отбрасываются
+    # Перед любым другим действием пользователя применяется его серия нажатий ➕/➖
+    dp.update.outer_middleware(UserLaneMiddleware(
+        config.UPDATE_WORKERS, config.UPDATE_DEDUPE_TTL, barriers=[settle_quantity_taps]
+    ))
     
     # Добавляем middleware для работы с базой данных
     dp.update.middleware(DatabaseMiddleware())
     
     # Подключаем роутеры
     dp.include_router(start_router)
-    dp.include_router(catalog_router)
-    dp.include_router(cart_router)
-    dp.include_router(order_router)
     dp.include_router(admin_router)
     
+    # Все callback-кнопки - через одно префиксное дерево; дубли регистраций падают здесь, при старте
+    callback_router = compile_callback_router(
+        start_callbacks, catalog_callbacks, cart_callbacks, order_callbacks
+    )
+    dp.include_router(callback_router.as_router())
+    
     return bot, dp
 
 async def start_bot():
     """Запуск бота"""
     await init_db()
+    await fsm_storage.load()
     bot, dp = await setup_bot()
     
+    tasks = start_background_tasks(bot)
+    
     print("🤖 Бот запущен!")
-    await dp.start_polling(bot)
\ No newline at end of file
+    try:
+        if config.BOT_MODE == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        # Незавершенные серии ➕/➖ пишутся в базу, пока она еще доступна
+        await quantity_coalescer.drain()
+        await stop_background_tasks(tasks)
+        await fsm_storage.close()
+        # Перерисовки из drain() могли заново открыть сессию, которую закрыл start_polling
+        await bot.session.close()
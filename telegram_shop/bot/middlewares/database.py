@@ -10,6 +10,7 @@ class DatabaseMiddleware(BaseMiddleware):
         event: Message,
         data: Dict[str, Any]
     ) -> Any:
-        async for session in get_db():
+        # Соединение берется из пула только если обработчик действительно обращается к базе
+        async with get_db() as session:
             data["session"] = session
-            return await handler(event, data)
\ No newline at end of file
+            return await handler(event, data)
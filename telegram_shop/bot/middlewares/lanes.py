@@ -0,0 +1,89 @@
+import asyncio
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Sequence
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+
+from utils.cache import TTLCache
+
+class UserLaneMiddleware(BaseMiddleware):
+    """
+    Обновления одного пользователя выполняются строго по очереди, разных - параллельно
+
+    Каждый пользователь получает свою очередь (asyncio.Lock отдает блокировку в порядке ожидания),
+    а общий семафор ограничивает число одновременно работающих обработчиков. Слот семафора
+    занимается только после своей очереди, чтобы ждущие пользователи не держали воркеры.
+    Повторно доставленные обновления и нажатия (те же update_id или id callback-запроса) отбрасываются.
+    barriers - корутины (update, telegram id), которые выполняются в очереди пользователя перед
+    обработчиком: так отложенная работа по прошлым обновлениям завершается раньше следующего.
+    FSMContextMiddleware читает состояние до очереди, поэтому внутри нее raw_state читается заново:
+    фильтры по состоянию видят результат предыдущего обновления пользователя.
+    """
+
+    def __init__(self, workers: int, dedupe_ttl: float,
+                 barriers: Sequence[Callable[[Update, int], Awaitable[Any]]] = ()):
+        self._workers = asyncio.Semaphore(workers)
+        self._barriers = tuple(barriers)
+        self._lanes = weakref.WeakValueDictionary()
+        self._seen = TTLCache(maxsize=100000, ttl=dedupe_ttl)
+        self.processed = 0
+        self.duplicates = 0
+        self.waiting = 0
+        self.max_waiting = 0
+
+    def stats(self) -> dict:
+        return {
+            "processed": self.processed,
+            "duplicates": self.duplicates,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+        }
+
+    def _is_duplicate(self, update: Update) -> bool:
+        keys = [("update", update.update_id)]
+        if update.callback_query is not None:
+            keys.append(("callback", update.callback_query.id))
+
+        if any(key in self._seen for key in keys):
+            self.duplicates += 1
+            return True
+        for key in keys:
+            self._seen.set(key, True)
+        return False
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        if self._is_duplicate(event):
+            return None
+
+        user = data.get("event_from_user")
+        if user is None:
+            async with self._workers:
+                return await handler(event, data)
+
+        lane = self._lanes.get(user.id)
+        if lane is None:
+            lane = self._lanes[user.id] = asyncio.Lock()
+
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await lane.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            for barrier in self._barriers:
+                await barrier(event, user.id)
+            state = data.get("state")
+            if state is not None:
+                data["raw_state"] = await state.get_state()
+            async with self._workers:
+                self.processed += 1
+                return await handler(event, data)
+        finally:
+            lane.release()
@@ -0,0 +1,224 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Optional
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import TelegramMethod
+
+from utils.cache import TTLCache
+import config
+
+class Priority(IntEnum):
+    """Чем меньше значение, тем раньше запрос получает слот глобального лимита"""
+    INTERACTIVE = 0
+    NOTIFICATION = 1
+
+send_priority: ContextVar[Priority] = ContextVar("send_priority", default=Priority.INTERACTIVE)
+
+@contextmanager
+def notification_priority():
+    """Запросы внутри блока уступают очередь ответам пользователям"""
+    token = send_priority.set(Priority.NOTIFICATION)
+    try:
+        yield
+    finally:
+        send_priority.reset(token)
+
+class TokenBucket:
+    """Корзина токенов; токены могут уходить в минус - это очередь уже выданных слотов"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Сколько ждать до свободного токена"""
+        self._refill()
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def reserve(self) -> float:
+        """Занимает слот сразу и возвращает, сколько ждать до его наступления"""
+        self._refill()
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def pause(self, seconds: float):
+        """Не выдавать токены ближайшие seconds секунд (ответ 429 от Telegram)"""
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+    def refill_time(self) -> float:
+        """Через сколько секунд корзина снова будет полной"""
+        self._refill()
+        return (self.capacity - self.tokens) / self.rate
+
+def chat_limit_kind(method: TelegramMethod) -> Optional[str]:
+    """Корзина лимита чата для метода: новые сообщения и правки считаются раздельно
+
+    Остальные методы с chat_id (sendChatAction, deleteMessage и т.п.) идут только через общий лимит.
+    """
+    name = method.__api_method__
+    if name.startswith("editMessage"):
+        return "edit"
+    if name.startswith(("send", "copyMessage", "forwardMessage")) and name != "sendChatAction":
+        return "send"
+    return None
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Планировщик исходящих запросов бота: лимит на чат, общий лимит с приоритетами
+    и повтор после TelegramRetryAfter
+    """
+
+    def __init__(self, global_rate: float, global_burst: int, chat_rate: float, chat_burst: int,
+                 group_rate: float, max_retries: int, edit_rate: float, edit_burst: int):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.edit_rate = edit_rate
+        self.edit_burst = edit_burst
+        self.max_retries = max_retries
+        # (чат, вид) -> корзина. Забыть можно только полную корзину: запись живет минуту,
+        # а после 429 - пока корзина не наполнится снова, то есть не меньше паузы
+        self._chat_buckets = TTLCache(maxsize=10000, ttl=60)
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._condition = asyncio.Condition()
+
+        self.sent = 0
+        self.acquired = 0
+        self.retries = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "sent": self.sent,
+            "retries": self.retries,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+    def _chat_bucket(self, chat_id, kind: str) -> TokenBucket:
+        bucket = self._chat_buckets.get((chat_id, kind))
+        if bucket is None:
+            # Отрицательный id - группа или канал, там лимит Telegram строже
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            if is_group:
+                bucket = TokenBucket(self.group_rate, self.chat_burst)
+            elif kind == "edit":
+                bucket = TokenBucket(self.edit_rate, self.edit_burst)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _remember(self, chat_id, kind: str, bucket: TokenBucket):
+        self._chat_buckets.set((chat_id, kind), bucket, ttl=max(60, bucket.refill_time()))
+
+    async def _acquire_global(self, priority: Priority):
+        """Слот общего лимита: первым его получает запрос с высшим приоритетом, затем по очереди"""
+        entry = (priority, next(self._sequence))
+        async with self._condition:
+            heapq.heappush(self._waiters, entry)
+            # Новый запрос мог оказаться важнее текущего первого в очереди
+            self._condition.notify_all()
+            try:
+                while True:
+                    if self._waiters[0] != entry:
+                        await self._condition.wait()
+                        continue
+                    delay = self.global_bucket.delay()
+                    if delay <= 0:
+                        heapq.heappop(self._waiters)
+                        self.global_bucket.take()
+                        self._condition.notify_all()
+                        return
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                if entry in self._waiters:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._condition.notify_all()
+                raise
+
+    async def _acquire(self, chat_id, kind, priority: Priority):
+        started = time.monotonic()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            if kind is not None:
+                bucket = self._chat_bucket(chat_id, kind)
+                delay = bucket.reserve()
+                self._remember(chat_id, kind, bucket)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            await self._acquire_global(priority)
+        finally:
+            self.waiting -= 1
+        waited = time.monotonic() - started
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    async def __call__(self, make_request: NextRequestMiddlewareType, bot: Bot, method: TelegramMethod):
+        # Лимиты Telegram касаются сообщений в чаты; getUpdates, answerCallbackQuery и т.п. идут сразу
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        kind = chat_limit_kind(method)
+        priority = send_priority.get()
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id, kind, priority)
+            try:
+                response = await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                self.retries += 1
+                print(f"⏳ Telegram просит подождать {e.retry_after} с (чат {chat_id})")
+                if kind is None:
+                    await asyncio.sleep(e.retry_after)
+                    continue
+                bucket = self._chat_bucket(chat_id, kind)
+                bucket.pause(e.retry_after)
+                self._remember(chat_id, kind, bucket)
+                continue
+            self.sent += 1
+            return response
+
+send_scheduler = SendScheduler(
+    global_rate=config.SEND_GLOBAL_RATE,
+    global_burst=config.SEND_GLOBAL_BURST,
+    chat_rate=config.SEND_CHAT_RATE,
+    chat_burst=config.SEND_CHAT_BURST,
+    group_rate=config.SEND_GROUP_RATE,
+    max_retries=config.SEND_MAX_RETRIES,
+    edit_rate=config.SEND_EDIT_RATE,
+    edit_burst=config.SEND_EDIT_BURST,
+)
@@ -0,0 +1,123 @@
+import asyncio
+from itertools import groupby
+
+from aiogram import Bot
+
+from bot.middlewares.rate_limit import notification_priority
+from database.engine import AsyncSessionLocal
+from database.repository import OutboxRepository
+import config
+
+# Лимит Telegram на длину сообщения с запасом под заголовок сводки
+MESSAGE_LIMIT = 4000
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+
+_wakeup = None
+
+def _get_wakeup() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+def wake_outbox_sender():
+    """Сигнал отправщику, что в outbox появились сообщения (после коммита)"""
+    _get_wakeup().set()
+
+def retry_delay(attempts: int) -> float:
+    """Экспоненциальная задержка повторной отправки"""
+    return min(config.OUTBOX_BACKOFF_MAX, config.OUTBOX_BACKOFF_BASE * 2 ** attempts)
+
+def build_digest(messages: list) -> list[tuple[list[int], str]]:
+    """Склеивает уведомления в сводки, не превышая лимит длины сообщения"""
+    chunks, ids, current = [], [], ""
+    for message in messages:
+        candidate = f"{current}{DIGEST_SEPARATOR}{message.text}" if current else message.text
+        if current and len(candidate) > MESSAGE_LIMIT:
+            chunks.append((ids, current))
+            ids, current = [], message.text
+        else:
+            current = candidate
+        ids.append(message.id)
+    if current:
+        chunks.append((ids, current))
+    return [(ids, f"📬 Сводка: {len(ids)} уведомлений\n\n{text}") for ids, text in chunks]
+
+class OutboxSender:
+    """Фоновая отправка уведомлений из outbox с повторами и сводками"""
+
+    def __init__(self, bot: Bot):
+        self.bot = bot
+        self.sent = 0
+        self.failed = 0
+        self.dead = 0
+
+    async def run(self):
+        wakeup = _get_wakeup()
+        while True:
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=config.OUTBOX_POLL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            wakeup.clear()
+
+            try:
+                # Окно сводки ждем, только если уведомления уже копятся: одиночное уходит сразу
+                if config.OUTBOX_DIGEST_WINDOW > 0 and await self._has_backlog():
+                    await asyncio.sleep(config.OUTBOX_DIGEST_WINDOW)
+                await self.drain()
+            except Exception as e:
+                print(f"❌ Ошибка отправки outbox: {e}")
+
+    async def _has_backlog(self) -> bool:
+        async with AsyncSessionLocal() as session:
+            return await OutboxRepository.has_backlog(session, config.OUTBOX_MAX_ATTEMPTS)
+
+    async def drain(self):
+        """Отправляет все уведомления, срок которых наступил"""
+        while True:
+            async with AsyncSessionLocal() as session:
+                messages = await OutboxRepository.fetch_due(
+                    session, config.OUTBOX_BATCH_SIZE, config.OUTBOX_MAX_ATTEMPTS
+                )
+                if not messages:
+                    return
+
+                messages.sort(key=lambda message: (message.chat_id, message.id))
+                for chat_id, group in groupby(messages, key=lambda message: message.chat_id):
+                    await self._send_group(session, chat_id, list(group))
+
+            if len(messages) < config.OUTBOX_BATCH_SIZE:
+                return
+
+    async def _send_group(self, session, chat_id: int, messages: list):
+        if config.OUTBOX_DIGEST_WINDOW > 0 and len(messages) >= config.OUTBOX_DIGEST_THRESHOLD:
+            units = build_digest(messages)
+        else:
+            units = [([message.id], message.text) for message in messages]
+        attempts = max(message.attempts for message in messages)
+
+        for position, (ids, text) in enumerate(units):
+            try:
+                # Уведомления пропускают вперед ответы пользователям
+                with notification_priority():
+                    await self.bot.send_message(chat_id=chat_id, text=text)
+            except Exception as e:
+                # Остальные сообщения чата откладываем тоже, чтобы не нарушить порядок
+                pending = [i for unit_ids, _ in units[position:] for i in unit_ids]
+                self.failed += len(pending)
+                await OutboxRepository.mark_failed(session, pending, str(e), retry_delay(attempts))
+                print(f"❌ Ошибка отправки уведомления в чат {chat_id}: {e}")
+                # После последней попытки OUTBOX_DUE их больше не выберет - сообщаем явно
+                dead = [
+                    message.id for message in messages
+                    if message.id in pending and message.attempts + 1 >= config.OUTBOX_MAX_ATTEMPTS
+                ]
+                if dead:
+                    self.dead += len(dead)
+                    print(f"☠️ Уведомления {dead} в чат {chat_id} не отправлены после "
+                          f"{config.OUTBOX_MAX_ATTEMPTS} попыток и больше не повторяются")
+                return
+
+            self.sent += len(ids)
+            await OutboxRepository.mark_sent(session, ids)
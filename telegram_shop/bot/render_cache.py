@@ -0,0 +1,46 @@
+import hashlib
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, InlineKeyboardMarkup
+
+from utils.cache import TTLCache
+
+# Последнее отрисованное состояние сообщения: (chat_id, message_id) -> хэш текста и клавиатуры.
+# Старые сообщения пользователи почти не трогают, поэтому хватает ограниченного кэша с TTL.
+render_cache = TTLCache(maxsize=20000, ttl=24 * 60 * 60)
+
+class RenderStats:
+    def __init__(self):
+        self.skipped = 0
+        self.edited = 0
+        self.not_modified = 0
+
+    def as_dict(self) -> dict:
+        return {"skipped": self.skipped, "edited": self.edited, "not_modified": self.not_modified}
+
+render_stats = RenderStats()
+
+def render_hash(text: str, reply_markup: Optional[InlineKeyboardMarkup]) -> str:
+    markup = reply_markup.model_dump_json(exclude_none=True) if reply_markup is not None else ""
+    return hashlib.blake2b(f"{text}\0{markup}".encode(), digest_size=16).hexdigest()
+
+async def edit_message(message: Message, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None):
+    """edit_text, который не ходит в Telegram, если на экране уже то же самое"""
+    key = (message.chat.id, message.message_id)
+    digest = render_hash(text, reply_markup)
+    if render_cache.get(key) == digest:
+        render_stats.skipped += 1
+        return
+
+    try:
+        await message.edit_text(text, reply_markup=reply_markup)
+    except TelegramBadRequest as e:
+        if "message is not modified" not in str(e):
+            render_cache.pop(key)
+            raise
+        # Сообщение уже в этом состоянии (например, после перезапуска бота)
+        render_stats.not_modified += 1
+    else:
+        render_stats.edited += 1
+    render_cache.set(key, digest)
@@ -0,0 +1,89 @@
+import asyncio
+import hmac
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+import config
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+class WebhookHandler:
+    """
+    Прием обновлений от Telegram
+
+    Запрос подтверждается сразу, а обновление обрабатывается в фоне. Одновременно
+    обрабатывается не больше max_concurrency обновлений: сверх этого ответ Telegram
+    задерживается, и он сам притормаживает доставку.
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher, secret: str, max_concurrency: int):
+        self.bot = bot
+        self.dp = dp
+        self.secret = secret
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks = set()
+        self.received = 0
+        self.rejected = 0
+
+    def stats(self) -> dict:
+        return {"received": self.received, "rejected": self.rejected, "in_flight": len(self._tasks)}
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            self.rejected += 1
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except ValueError:
+            return web.Response(status=400)
+        self.received += 1
+
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update: Update):
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            print(f"❌ Ошибка обработки обновления {update.update_id}: {e}")
+        finally:
+            self._semaphore.release()
+
+    async def drain(self):
+        """Дождаться обновлений, которые уже приняты"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+def create_webhook_app(handler: WebhookHandler) -> web.Application:
+    app = web.Application()
+    app.router.add_post(config.WEBHOOK_PATH, handler.handle)
+    return app
+
+async def run_webhook(bot: Bot, dp: Dispatcher):
+    """Регистрирует webhook в Telegram и обслуживает его до остановки"""
+    handler = WebhookHandler(bot, dp, config.WEBHOOK_SECRET, config.WEBHOOK_MAX_CONCURRENCY)
+    runner = web.AppRunner(create_webhook_app(handler))
+    await runner.setup()
+    site = web.TCPSite(runner, config.WEBHOOK_HOST, config.WEBHOOK_PORT)
+    await site.start()
+
+    await bot.set_webhook(
+        url=config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH,
+        secret_token=config.WEBHOOK_SECRET,
+        allowed_updates=dp.resolve_used_update_types(),
+        max_connections=min(100, config.WEBHOOK_MAX_CONCURRENCY),
+    )
+    print(f"🌐 Webhook слушает {config.WEBHOOK_HOST}:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await handler.drain()
+        await bot.session.close()
@@ -11,9 +11,100 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 ADMIN_HOST = os.getenv("ADMIN_HOST", "0.0.0.0")
 ADMIN_PORT = int(os.getenv("ADMIN_PORT", "5000"))
 ADMIN_SECRET_KEY = os.getenv("ADMIN_SECRET_KEY", "your-secret-key-change-in-production")
+# Сервер админ-панели: "threaded" (пул потоков Werkzeug), "waitress" (если установлен) или "dev" (отладка с перезагрузкой)
+ADMIN_SERVER = os.getenv("ADMIN_SERVER", "threaded")
+ADMIN_THREADS = int(os.getenv("ADMIN_THREADS", "8"))
+# Каждый поток держит не больше одного соединения, поэтому пул по числу потоков
+ADMIN_DB_POOL_SIZE = int(os.getenv("ADMIN_DB_POOL_SIZE", str(ADMIN_THREADS)))
+
+# Настройки хранилища SQLite (профиль "default" - поведение SQLite по умолчанию)
+DB_PROFILE = os.getenv("DB_PROFILE", "tuned")
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() in ("1", "true", "yes")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024)))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+
+# Кэш пользователей telegram_id -> id в базе
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "600"))
+
+# Как часто бот сверяет версию каталога (секунды)
+CATALOG_VERSION_CHECK_INTERVAL = float(os.getenv("CATALOG_VERSION_CHECK_INTERVAL", "1.0"))
+# Снимок каталога пересобирается не реже, чем раз в столько секунд (обновляет резервы в карточке товара)
+CATALOG_SNAPSHOT_MAX_AGE = float(os.getenv("CATALOG_SNAPSHOT_MAX_AGE", "30"))
+
+# Резерв товара на время оформления заказа
+RESERVATION_TTL_SECONDS = int(os.getenv("RESERVATION_TTL_SECONDS", "900"))
+RESERVATION_SWEEP_INTERVAL = float(os.getenv("RESERVATION_SWEEP_INTERVAL", "30"))
+
+# Очередь уведомлений администратору (outbox)
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "10"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_DIGEST_WINDOW = float(os.getenv("OUTBOX_DIGEST_WINDOW", "2"))  # 0 - без сводок
+OUTBOX_DIGEST_THRESHOLD = int(os.getenv("OUTBOX_DIGEST_THRESHOLD", "3"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "5"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "600"))
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))  # сколько хранить отправленные
+OUTBOX_PRUNE_INTERVAL = float(os.getenv("OUTBOX_PRUNE_INTERVAL", "3600"))
+
+# Лимиты исходящих сообщений (сообщений в секунду и размер пачки)
+SEND_GLOBAL_RATE = float(os.getenv("SEND_GLOBAL_RATE", "30"))
+SEND_GLOBAL_BURST = int(os.getenv("SEND_GLOBAL_BURST", "30"))
+SEND_CHAT_RATE = float(os.getenv("SEND_CHAT_RATE", "1"))
+SEND_CHAT_BURST = int(os.getenv("SEND_CHAT_BURST", "3"))
+SEND_GROUP_RATE = float(os.getenv("SEND_GROUP_RATE", str(20 / 60)))
+# Правки сообщений (editMessage*) считаются отдельно от новых сообщений чата
+SEND_EDIT_RATE = float(os.getenv("SEND_EDIT_RATE", "1"))
+SEND_EDIT_BURST = int(os.getenv("SEND_EDIT_BURST", "3"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+
+# Окно, в котором нажатия ➕/➖ на одном сообщении корзины склеиваются в одно изменение (секунды)
+CART_COALESCE_WINDOW = float(os.getenv("CART_COALESCE_WINDOW", "0.4"))
+
+# Хранилище FSM: лимит записей в памяти, срок жизни брошенных состояний и фоновое сохранение в базу
+FSM_MAX_RECORDS = int(os.getenv("FSM_MAX_RECORDS", "50000"))
+FSM_STATE_TTL = float(os.getenv("FSM_STATE_TTL", str(6 * 60 * 60)))
+FSM_PERSIST = os.getenv("FSM_PERSIST", "true").lower() in ("1", "true", "yes")
+FSM_FLUSH_INTERVAL = float(os.getenv("FSM_FLUSH_INTERVAL", "2"))
+
+# Обработка обновлений: сколько обновлений выполняется одновременно и сколько помним их id для защиты от дублей
+UPDATE_WORKERS = int(os.getenv("UPDATE_WORKERS", "32"))
+UPDATE_DEDUPE_TTL = float(os.getenv("UPDATE_DEDUPE_TTL", "600"))
+
+# Получение обновлений: "polling" (getUpdates) или "webhook" (встроенный HTTP-сервер)
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # публичный адрес, например https://shop.example.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "64"))
+# Свой сервер Bot API (локальный telegram-bot-api или тестовый стенд)
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL")
+
+# Сверка счетчиков строк таблиц (table_counters) с COUNT(*), секунды
+TABLE_COUNTERS_RECONCILE_INTERVAL = float(os.getenv("TABLE_COUNTERS_RECONCILE_INTERVAL", "3600"))
+
+# Админ-панель: заказов на одной странице списка
+ADMIN_ORDERS_PAGE_SIZE = int(os.getenv("ADMIN_ORDERS_PAGE_SIZE", "50"))
 
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN не установлен в .env файле")
 
+if BOT_MODE not in ("polling", "webhook"):
+    raise ValueError(f"Неизвестный BOT_MODE: {BOT_MODE}")
+
+if BOT_MODE == "webhook" and not (WEBHOOK_URL and WEBHOOK_SECRET):
+    raise ValueError("Для BOT_MODE=webhook нужны WEBHOOK_URL и WEBHOOK_SECRET")
+
+if ADMIN_SERVER not in ("threaded", "waitress", "dev"):
+    raise ValueError(f"Неизвестный ADMIN_SERVER: {ADMIN_SERVER}")
+
 if not ADMIN_ID:
     print("⚠️  ADMIN_ID не установлен. Админ-панель будет недоступна.")
\ No newline at end of file
@@ -0,0 +1,172 @@
+import asyncio
+import time
+from array import array
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import queries
+from database.dto import CategoryRow, BrandRow, ProductRow, ProductDetail
+import config
+
+class CatalogSnapshot:
+    """
+    Неизменяемый снимок активного каталога в памяти бота
+
+    Товары хранятся по колонкам (array для чисел, списки для строк), позиция товара
+    находится по id через словарь. Индексы категория -> бренды и бренд -> товары в наличии
+    собираются один раз при построении, поэтому обработчики каталога не ходят в базу.
+    """
+
+    __slots__ = (
+        "version", "built_at", "categories", "_position", "_names", "_descriptions", "_prices",
+        "_quantities", "_reserved", "_brand_ids", "_category_ids", "_brand_names", "_category_names",
+        "_brands_by_category", "_products_by_brand",
+    )
+
+    def __init__(self, version: int, categories, brands, products):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.categories = tuple(CategoryRow(*row) for row in categories)
+        self._category_names = {category.id: category.name for category in self.categories}
+        self._brand_names = {brand_id: name for brand_id, name in brands}
+
+        self._position = {}
+        self._names = []
+        self._descriptions = []
+        self._prices = array("d")
+        self._quantities = array("q")
+        self._reserved = array("q")
+        self._brand_ids = array("q")
+        self._category_ids = array("q")
+
+        brands_by_category = {}
+        products_by_brand = {}
+        # Товары приходят отсортированными по бренду и названию - списки брендов сразу упорядочены
+        for product_id, name, description, price, quantity, reserved, brand_id, category_id in products:
+            self._position[product_id] = len(self._names)
+            self._names.append(name)
+            self._descriptions.append(description)
+            self._prices.append(price)
+            self._quantities.append(quantity or 0)
+            self._reserved.append(reserved or 0)
+            self._brand_ids.append(brand_id or 0)
+            self._category_ids.append(category_id or 0)
+
+            if brand_id in self._brand_names:
+                brands_by_category.setdefault(category_id, {})[brand_id] = None
+            if (quantity or 0) > 0:
+                products_by_brand.setdefault(brand_id, []).append(ProductRow(product_id, name, price, quantity))
+
+        self._brands_by_category = {
+            category_id: tuple(BrandRow(brand_id, self._brand_names[brand_id]) for brand_id in brand_ids)
+            for category_id, brand_ids in brands_by_category.items()
+        }
+        self._products_by_brand = {brand_id: tuple(rows) for brand_id, rows in products_by_brand.items()}
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def get_brands(self, category_id: int) -> tuple:
+        """Активные бренды, у которых есть активные товары в категории"""
+        return self._brands_by_category.get(category_id, ())
+
+    def get_products(self, brand_id: int) -> tuple:
+        """Активные товары бренда в наличии, по названию"""
+        return self._products_by_brand.get(brand_id, ())
+
+    def get_product(self, product_id: int) -> Optional[ProductDetail]:
+        """Карточка активного товара по id"""
+        position = self._position.get(product_id)
+        if position is None:
+            return None
+        brand_id = self._brand_ids[position]
+        return ProductDetail(
+            product_id,
+            self._names[position],
+            self._descriptions[position],
+            self._prices[position],
+            self._quantities[position],
+            self._reserved[position],
+            True,
+            brand_id,
+            self._brand_names.get(brand_id),
+            self._category_names.get(self._category_ids[position]),
+        )
+
+class CatalogStore:
+    """
+    Держит текущий снимок каталога и подменяет его целиком при пересборке
+
+    Фоновая задача сверяет версию каталога (её увеличивают триггеры на каждое изменение)
+    и строит новый снимок, когда версия сменилась или снимок старше max_age: резервы
+    не меняют версию, а карточка товара показывает остаток за вычетом резервов.
+    Обработчики читают self.snapshot без блокировок - присваивание атрибута атомарно.
+    """
+
+    def __init__(self, max_age: float):
+        self.max_age = max_age
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._lock = asyncio.Lock()
+        self._stale = False
+        self.rebuilds = 0
+        self.build_time = 0.0
+
+    @property
+    def version(self):
+        return self.snapshot.version if self.snapshot is not None else None
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "products": len(self.snapshot) if self.snapshot is not None else 0,
+            "rebuilds": self.rebuilds,
+            "build_time": self.build_time,
+        }
+
+    def _is_fresh(self, version) -> bool:
+        snapshot = self.snapshot
+        return (
+            snapshot is not None
+            and not self._stale
+            and snapshot.version == version
+            and time.monotonic() - snapshot.built_at < self.max_age
+        )
+
+    async def refresh(self, session: AsyncSession, force: bool = False) -> bool:
+        """Пересобирает снимок, если каталог изменился; True - снимок заменен"""
+        if not force and self._is_fresh(await session.scalar(queries.CATALOG_VERSION)):
+            return False
+
+        async with self._lock:
+            if not force and self._is_fresh(await session.scalar(queries.CATALOG_VERSION)):
+                return False
+
+            started = time.perf_counter()
+            for _ in range(3):
+                version = await session.scalar(queries.CATALOG_VERSION)
+                categories = (await session.execute(queries.SNAPSHOT_CATEGORIES)).all()
+                brands = (await session.execute(queries.SNAPSHOT_BRANDS)).all()
+                products = (await session.execute(queries.SNAPSHOT_PRODUCTS)).all()
+                # Пока читали таблицы, каталог могли изменить: читаем заново. Если не успели,
+                # снимок получает версию до чтения и пересоберется при следующей проверке
+                if await session.scalar(queries.CATALOG_VERSION) == version:
+                    break
+
+            self.snapshot = CatalogSnapshot(version, categories, brands, products)
+            self._stale = False
+            self.build_time = time.perf_counter() - started
+            self.rebuilds += 1
+            return True
+
+    async def current(self, session: AsyncSession) -> CatalogSnapshot:
+        """Текущий снимок; база нужна только если снимок еще не построен"""
+        if self.snapshot is None:
+            await self.refresh(session)
+        return self.snapshot
+
+    def invalidate(self):
+        """Пересобрать снимок при следующей проверке"""
+        self._stale = True
+
+catalog_store = CatalogStore(max_age=config.CATALOG_SNAPSHOT_MAX_AGE)
@@ -0,0 +1,53 @@
+"""
+Легкие неизменяемые строки для отрисовки в боте
+
+Запросы каталога и корзины выбирают только нужные колонки и упаковывают их в NamedTuple:
+без ORM-объектов, identity map и отслеживания изменений. Кортежи можно спокойно
+хранить в кэше каталога дольше сессии.
+"""
+from typing import NamedTuple, Optional
+
+class UserIdentity(NamedTuple):
+    """Неизменяемый снимок пользователя для кэша"""
+    id: int
+    telegram_id: int
+    username: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+
+class CategoryRow(NamedTuple):
+    id: int
+    name: str
+
+class BrandRow(NamedTuple):
+    id: int
+    name: str
+
+class ProductRow(NamedTuple):
+    """Товар в списке бренда"""
+    id: int
+    name: str
+    price: float
+    quantity: int
+
+class ProductDetail(NamedTuple):
+    """Карточка товара вместе с названиями бренда и категории"""
+    id: int
+    name: str
+    description: Optional[str]
+    price: float
+    quantity: int
+    reserved_quantity: int
+    is_active: bool
+    brand_id: int
+    brand_name: str
+    category_name: str
+
+class CartLine(NamedTuple):
+    """Строка корзины вместе с данными товара для отрисовки"""
+    id: int
+    product_id: int
+    name: str
+    price: float
+    quantity: int
+    stock: int
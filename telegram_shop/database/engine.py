@@ -1,22 +1,70 @@
+from contextlib import asynccontextmanager
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from .models import Base
+from .migrations import upgrade
+from .storage import apply_storage_profile, get_engine_options
 import config
 
-engine = create_async_engine(config.DATABASE_URL, echo=True)
+def build_engine(url: str = None, profile: str = None):
+    """Создает async движок с настройками выбранного профиля хранилища"""
+    url = url or config.DATABASE_URL
+    engine = create_async_engine(url, **get_engine_options(url, profile))
+    return apply_storage_profile(engine, profile)
+
+engine = build_engine()
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(upgrade)
+
+class LazySession:
+    """Прокси AsyncSession: сессия создается при первом обращении, пустые транзакции не коммитятся"""
+
+    def __init__(self, factory=None):
+        self._factory = factory or AsyncSessionLocal
+        self._session = None
+
+    @property
+    def is_used(self) -> bool:
+        return self._session is not None
+
+    def _get_session(self):
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self._get_session(), name)
+
+    def _has_work(self) -> bool:
+        session = self._session
+        return session is not None and bool(
+            session.in_transaction() or session.new or session.dirty or session.deleted
+        )
+
+    async def commit(self):
+        if self._has_work():
+            await self._session.commit()
+
+    async def rollback(self):
+        if self._session is not None and self._session.in_transaction():
+            await self._session.rollback()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
 
+@asynccontextmanager
 async def get_db():
-    """Генератор сессий для middleware"""
-    async with AsyncSessionLocal() as session:
-        try:
-            yield session
-            await session.commit()
-        except Exception:
-            await session.rollback()
-            raise
-        finally:
-            await session.close()
\ No newline at end of file
+    """Сессия на одно обновление для middleware"""
+    session = LazySession()
+    try:
+        yield session
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+    finally:
+        await session.close()
@@ -0,0 +1,234 @@
+"""
+Версионные миграции схемы SQLite
+Текущая версия хранится в PRAGMA user_version, шаги идемпотентны и обновляют живую базу на месте.
+Запуск: python -m database.migrations [--check]
+"""
+import re
+import sys
+from datetime import datetime
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import DBAPIError
+
+from . import queries
+from .models import Base
+from .order_stats import ROLLUP_TRIGGERS, rebuild as rebuild_order_stats
+from .table_counters import COUNTER_TRIGGERS, reconcile as reconcile_table_counters
+
+CATALOG_TABLES = ("categories", "brands", "products")
+
+def add_column(table: str, column: str, ddl: str):
+    """Шаг миграции: ADD COLUMN, если колонки еще нет (create_all ее уже мог создать)"""
+    def step(connection):
+        columns = [row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")]
+        if column not in columns:
+            connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+    return step
+
+def _catalog_version_triggers() -> list[str]:
+    """Любое изменение каталога (бот или админ-панель) увеличивает версию в той же транзакции"""
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_catalog_version "
+        f"AFTER {operation} ON {table} "
+        f"BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END"
+        for table in CATALOG_TABLES
+        for operation in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+# (версия, описание, шаги). Шаг - SQL строка или функция, принимающая sync Connection
+MIGRATIONS = [
+    (1, "Индексы для горячих запросов", [
+        "CREATE INDEX IF NOT EXISTS ix_cart_items_user_product ON cart_items (user_id, product_id)",
+        "CREATE INDEX IF NOT EXISTS ix_products_category_brand ON products (category_id, brand_id) WHERE is_active = 1",
+        "CREATE INDEX IF NOT EXISTS ix_products_brand_name ON products (brand_id, name) WHERE is_active = 1",
+        "CREATE INDEX IF NOT EXISTS ix_orders_status_created ON orders (status, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_orders_created_at ON orders (created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_order_items_order ON order_items (order_id)",
+    ]),
+    (2, "Версия каталога для инвалидации кэша бота", [
+        "CREATE TABLE IF NOT EXISTS catalog_version ("
+        "id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO catalog_version (id, version) VALUES (1, 0)",
+        *_catalog_version_triggers(),
+    ]),
+    (3, "Уникальная пара (user_id, product_id) в корзине", [
+        # Сливаем дубли, которые успел создать старый SELECT-then-INSERT
+        "UPDATE cart_items SET quantity = ("
+        "SELECT SUM(c.quantity) FROM cart_items c "
+        "WHERE c.user_id = cart_items.user_id AND c.product_id = cart_items.product_id) "
+        "WHERE id IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id HAVING COUNT(*) > 1)",
+        "DELETE FROM cart_items WHERE id NOT IN (SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id)",
+        "DROP INDEX IF EXISTS ix_cart_items_user_product",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_cart_items_user_product ON cart_items (user_id, product_id)",
+    ]),
+    (4, "Резервирование товара при оформлении заказа", [
+        add_column("products", "reserved_quantity", "INTEGER NOT NULL DEFAULT 0"),
+        # Таблицу stock_holds и ее индексы создает create_all; резервы не меняют витрину каталога
+        "DROP TRIGGER IF EXISTS trg_products_update_catalog_version",
+        "CREATE TRIGGER IF NOT EXISTS trg_products_update_catalog_version "
+        "AFTER UPDATE OF name, description, price, quantity, image_url, is_active, category_id, brand_id "
+        "ON products BEGIN UPDATE catalog_version SET version = version + 1 WHERE id = 1; END",
+    ]),
+    # Ключ страницы заказов - (created_at, id). id - это rowid, он и так замыкает каждый индекс,
+    # поэтому ix_orders_created_at и ix_orders_status_created уже упорядочены по (..., created_at, id)
+    (5, "Постраничный список заказов с фильтром по клиенту", [
+        "CREATE INDEX IF NOT EXISTS ix_orders_user_created ON orders (user_id, created_at)",
+    ]),
+    # Таблицы сводок создает create_all; триггеры ведут их дальше, rebuild заполняет по истории
+    (6, "Сводная статистика заказов", [
+        *ROLLUP_TRIGGERS,
+        rebuild_order_stats,
+    ]),
+    # ADD COLUMN в SQLite не принимает DEFAULT CURRENT_TIMESTAMP: время добавления старых товаров
+    # неизвестно, им ставим время миграции. Новые товары получают created_at от ORM или админ-панели
+    (7, "Счетчики строк таблиц и дата добавления товара", [
+        add_column("products", "created_at", "DATETIME"),
+        "UPDATE products SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_products_created_at ON products (created_at)",
+        *COUNTER_TRIGGERS,
+        reconcile_table_counters,
+    ]),
+    (8, "Очистка отправленных уведомлений", [
+        "CREATE INDEX IF NOT EXISTS ix_notification_outbox_sent ON notification_outbox (sent_at) "
+        "WHERE sent_at IS NOT NULL",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Горячие запросы - те же конструкции, что выполняют бот и админ-панель, с примерными параметрами
+_PAGE_AFTER = ("2030-01-01 00:00:00", 1)
+
+HOT_QUERIES = {
+    "user_identity": (queries.USER_IDENTITY, {"telegram_id": 1}),
+    "add_to_cart": (queries.ADD_TO_CART, {"user_id": 1, "product_id": 1, "quantity": 1}),
+    "show_cart": (queries.CART_LINES, {"user_id": 1}),
+    "change_cart_quantities": (queries.CHANGE_CART_QUANTITIES, {"cart_user_id": 1, "deltas": '{"1": 1}'}),
+    "remove_from_cart": (queries.DELETE_CART_ITEM, {"user_id": 1, "cart_item_id": 1}),
+    "show_brands": (queries.BRANDS_IN_CATEGORY, {"category_id": 1}),
+    "show_products": (queries.PRODUCTS_IN_STOCK_BY_BRAND, {"brand_id": 1}),
+    "product_detail": (queries.PRODUCT_DETAIL, {"product_id": 1}),
+    "reserve_cart": (queries.RESERVE_CART_PRODUCTS, {"user_id": 1, "now": datetime(2030, 1, 1)}),
+    "release_user_holds": (queries.RELEASE_USER_HOLDS, {"user_id": 1, "now": datetime(2030, 1, 1)}),
+    "outbox_due": (queries.OUTBOX_DUE, {"now": datetime(2030, 1, 1), "max_attempts": 5, "limit": 50}),
+    "outbox_prune": (queries.OUTBOX_PRUNE_SENT, {"before": datetime(2030, 1, 1)}),
+    "order_statuses": (queries.ORDER_STATUSES_BY_ID, {"ids": [1, 2]}),
+    "adjust_order_stock": (queries.ADJUST_STOCK_FOR_ORDERS, {"ids": [1, 2], "sign": 1}),
+    "order_stats_since": (queries.ORDER_STATS_SINCE, {"since": "2030-01-01"}),
+    "orders_page": queries.admin_orders_page({}, _PAGE_AFTER),
+    "orders_page_by_status": queries.admin_orders_page({"status": "pending"}, _PAGE_AFTER),
+    "orders_page_by_customer": queries.admin_orders_page({"customer": "1"}, _PAGE_AFTER),
+    "latest_products": (queries.ADMIN_LATEST_PRODUCTS, {}),
+    "order_details": (queries.ADMIN_ORDER_ITEMS, {"order_id": 1}),
+}
+
+# "SCAN products" - полный проход по таблице; "SCAN ... USING INDEX" и "SEARCH" допустимы
+FULL_SCAN_RE = re.compile(r"^SCAN (\w+)(?: AS \w+)?$")
+DERIVED_RE = re.compile(r"^(?:MATERIALIZE|CO-ROUTINE) (\w+)$")
+
+def get_schema_version(connection) -> int:
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+def upgrade(connection) -> int:
+    """Применяет недостающие миграции к sync соединению и возвращает итоговую версию"""
+    current = get_schema_version(connection)
+
+    for version, description, steps in MIGRATIONS:
+        if version <= current:
+            continue
+
+        for step in steps:
+            if callable(step):
+                step(connection)
+            else:
+                connection.exec_driver_sql(step)
+
+        connection.exec_driver_sql(f"PRAGMA user_version = {version}")
+        current = version
+        print(f"🗄️ Миграция {version} применена: {description}")
+
+    return current
+
+def check_query_plans(connection) -> list[str]:
+    """Проверяет EXPLAIN QUERY PLAN горячих запросов и возвращает список полных сканов
+
+    Планы строятся на копии схемы в памяти без статистики: на маленькой живой базе
+    SQLite честно выбирает скан, и проверка зависела бы от текущего объема данных.
+    """
+    schema = connection.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' "
+        "ORDER BY type = 'index'"
+    ).scalars().all()
+
+    shadow = create_engine("sqlite://")
+    try:
+        with shadow.connect() as conn:
+            for ddl in schema:
+                conn.exec_driver_sql(ddl)
+            conn.commit()
+
+            problems = []
+            for name, (statement, params) in HOT_QUERIES.items():
+                try:
+                    plan = explain(conn, statement, params)
+                except DBAPIError as e:
+                    # Например, ON CONFLICT без уникального индекса - запрос упадет и в бою
+                    problems.append(f"{name}: {e.orig}")
+                    continue
+                # Проход по подзапросу, который план сам собрал (MATERIALIZE/CO-ROUTINE), - не скан таблицы
+                derived = {match.group(1) for match in map(DERIVED_RE.match, plan) if match}
+                for detail in plan:
+                    match = FULL_SCAN_RE.match(detail)
+                    if match and match.group(1) not in derived:
+                        problems.append(f"{name}: {detail}")
+            return problems
+    finally:
+        shadow.dispose()
+
+def explain(connection, statement, params) -> list[str]:
+    """EXPLAIN QUERY PLAN для SQL, в который SQLAlchemy компилирует statement
+
+    Запрос перехватывается перед выполнением уже с итоговыми параметрами (в том числе
+    раскрытыми IN), сам statement выполняется на пустой копии схемы и откатывается.
+    """
+    plans = []
+
+    def capture(conn, cursor, sql, parameters, context, executemany):
+        plans.extend(row[-1] for row in cursor.connection.execute(f"EXPLAIN QUERY PLAN {sql}", parameters))
+
+    event.listen(connection, "before_cursor_execute", capture)
+    transaction = connection.begin()
+    try:
+        # Некоторые операции - кортеж запросов, выполняемых вместе (RELEASE_*)
+        for part in statement if isinstance(statement, tuple) else (statement,):
+            connection.execute(part, params)
+    finally:
+        transaction.rollback()
+        event.remove(connection, "before_cursor_execute", capture)
+    return plans
+
+def migrate_sync_engine(engine) -> int:
+    """Создает недостающие таблицы и применяет миграции через sync движок (админ-панель, CLI)"""
+    with engine.begin() as conn:
+        Base.metadata.create_all(conn)
+        return upgrade(conn)
+
+def main():
+    import config
+
+    engine = create_engine(config.DATABASE_URL.replace("sqlite+aiosqlite", "sqlite"))
+    version = migrate_sync_engine(engine)
+    print(f"✅ Версия схемы: {version}")
+
+    if "--check" in sys.argv:
+        with engine.connect() as conn:
+            problems = check_query_plans(conn)
+        if problems:
+            print("❌ Горячие запросы читают таблицу целиком:")
+            for problem in problems:
+                print(f"   • {problem}")
+            sys.exit(1)
+        print("✅ Все горячие запросы используют индексы")
+
+if __name__ == "__main__":
+    main()
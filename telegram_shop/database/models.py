@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, ForeignKey, Index, text as sql_text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -36,9 +36,11 @@ class Product(Base):
     description = Column(Text)
     price = Column(Float, nullable=False)
     quantity = Column(Integer, default=0)
-    # 🚫 НЕТ reserved_quantity!
+    # Сумма активных резервов (stock_holds), доступно = quantity - reserved_quantity
+    reserved_quantity = Column(Integer, nullable=False, default=0, server_default='0')
     image_url = Column(String(500))
     is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(pytz.utc), index=True)
     
     category_id = Column(Integer, ForeignKey('categories.id'))
     brand_id = Column(Integer, ForeignKey('brands.id'))
@@ -46,6 +48,7 @@ class Product(Base):
     category = relationship("Category", back_populates="products")
     brand = relationship("Brand", back_populates="products")
     cart_items = relationship("CartItem", back_populates="product")
+    holds = relationship("StockHold", back_populates="product")
 
 class User(Base):
     __tablename__ = 'users'
@@ -63,6 +66,10 @@ class User(Base):
 
 class CartItem(Base):
     __tablename__ = 'cart_items'
+    __table_args__ = (
+        # Одна строка на пару (пользователь, товар) - на нее опирается upsert в add_to_cart
+        Index('ux_cart_items_user_product', 'user_id', 'product_id', unique=True),
+    )
     
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'))
@@ -73,6 +80,24 @@ class CartItem(Base):
     user = relationship("User", back_populates="cart_items")
     product = relationship("Product", back_populates="cart_items")
 
+class StockHold(Base):
+    """Временный резерв товара под оформляемый заказ"""
+    __tablename__ = 'stock_holds'
+    __table_args__ = (
+        Index('ux_stock_holds_user_product', 'user_id', 'product_id', unique=True),
+        Index('ix_stock_holds_product_expires', 'product_id', 'expires_at'),
+        Index('ix_stock_holds_expires', 'expires_at'),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    product_id = Column(Integer, ForeignKey('products.id'), nullable=False)
+    quantity = Column(Integer, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(pytz.utc))
+    
+    product = relationship("Product", back_populates="holds")
+
 class Order(Base):
     __tablename__ = 'orders'
     
@@ -106,4 +131,56 @@ class OrderItem(Base):
     quantity = Column(Integer, default=1)
     
     order = relationship("Order", back_populates="order_items")
-    product = relationship("Product")
\ No newline at end of file
+    product = relationship("Product")
+
+class OutboxMessage(Base):
+    """Исходящее уведомление, записанное в одной транзакции с событием и отправляемое фоном"""
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        Index('ix_notification_outbox_due', 'next_attempt_at', sqlite_where=sql_text('sent_at IS NULL')),
+    )
+    
+    id = Column(Integer, primary_key=True)
+    chat_id = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=lambda: datetime.now(pytz.utc))
+    sent_at = Column(DateTime)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=lambda: datetime.now(pytz.utc))
+
+class FsmState(Base):
+    """Состояние FSM пользователя, сохраненное фоном, чтобы оформление заказа пережило перезапуск"""
+    __tablename__ = 'fsm_states'
+    __table_args__ = (
+        Index('ix_fsm_states_updated', 'updated_at'),
+    )
+    
+    key = Column(String, primary_key=True)
+    state = Column(String)
+    data = Column(Text)
+    updated_at = Column(DateTime, nullable=False)
+
+class OrderStatsDaily(Base):
+    """Число заказов и выручка за день (UTC) в разрезе статуса; ведется триггерами на orders"""
+    __tablename__ = 'order_stats_daily'
+    
+    day = Column(String(10), primary_key=True)
+    status = Column(String(50), primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class OrderStatsTotal(Base):
+    """Итоги за все время в разрезе статуса; ведется триггерами на orders"""
+    __tablename__ = 'order_stats_total'
+    
+    status = Column(String(50), primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0)
+
+class TableCounter(Base):
+    """Число строк таблицы; ведется триггерами, сверяется фоновой задачей (database.table_counters)"""
+    __tablename__ = 'table_counters'
+    
+    table_name = Column(String(50), primary_key=True)
+    row_count = Column(Integer, nullable=False, default=0)
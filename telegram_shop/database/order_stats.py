@@ -0,0 +1,113 @@
+"""
+Сводная статистика заказов без прохода по orders
+
+order_stats_daily (день, статус) и order_stats_total (статус) хранят число заказов и выручку.
+Триггеры на orders поправляют обе сводки в той же транзакции, что и изменение заказа, поэтому
+их одинаково ведут бот (оформление) и админ-панель (смена статуса, удаление, правки).
+rebuild() пересчитывает сводки с нуля: первичное заполнение и сверка.
+Запуск: python -m database.order_stats [--rebuild]
+"""
+import sys
+
+from sqlalchemy import create_engine
+
+ORDER_STATUSES = ("pending", "confirmed", "completed", "cancelled")
+
+def _rollup(sign: str, row: str) -> str:
+    """Прибавляет (sign='+') или вычитает (sign='-') заказ row (NEW/OLD) из обеих сводок"""
+    day = f"COALESCE(date({row}.created_at), '')"
+    status = f"COALESCE({row}.status, '')"
+    amount = f"{sign}COALESCE({row}.total_amount, 0)"
+    return (
+        f"INSERT INTO order_stats_daily (day, status, orders, revenue) "
+        f"VALUES ({day}, {status}, {sign}1, {amount}) "
+        f"ON CONFLICT (day, status) DO UPDATE SET "
+        f"orders = orders + excluded.orders, revenue = revenue + excluded.revenue; "
+        f"INSERT INTO order_stats_total (status, orders, revenue) "
+        f"VALUES ({status}, {sign}1, {amount}) "
+        f"ON CONFLICT (status) DO UPDATE SET "
+        f"orders = orders + excluded.orders, revenue = revenue + excluded.revenue;"
+    )
+
+ROLLUP_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS trg_orders_insert_stats AFTER INSERT ON orders "
+    f"BEGIN {_rollup('+', 'NEW')} END",
+    "CREATE TRIGGER IF NOT EXISTS trg_orders_delete_stats AFTER DELETE ON orders "
+    f"BEGIN {_rollup('-', 'OLD')} END",
+    "CREATE TRIGGER IF NOT EXISTS trg_orders_update_stats "
+    "AFTER UPDATE OF status, total_amount, created_at ON orders "
+    f"BEGIN {_rollup('-', 'OLD')} {_rollup('+', 'NEW')} END",
+]
+
+REBUILD_STEPS = [
+    "DELETE FROM order_stats_daily",
+    "DELETE FROM order_stats_total",
+    "INSERT INTO order_stats_daily (day, status, orders, revenue) "
+    "SELECT COALESCE(date(created_at), ''), COALESCE(status, ''), COUNT(*), COALESCE(SUM(total_amount), 0) "
+    "FROM orders GROUP BY 1, 2",
+    "INSERT INTO order_stats_total (status, orders, revenue) "
+    "SELECT status, SUM(orders), SUM(revenue) FROM order_stats_daily GROUP BY status",
+]
+
+def rebuild(connection):
+    """Пересчитывает сводки по таблице orders (sync Connection, внутри транзакции)"""
+    for step in REBUILD_STEPS:
+        connection.exec_driver_sql(step)
+
+def summarize(totals) -> dict:
+    """Строки (status, orders, revenue) -> счетчики для шапки заказов и /stats
+
+    Отмененные заказы не входят ни в общее число, ни в выручку.
+    """
+    summary = {f"{status}_orders": 0 for status in ORDER_STATUSES}
+    summary["total_orders"] = 0
+    summary["total_revenue"] = 0.0
+    for status, orders, revenue in totals:
+        summary[f"{status}_orders"] = orders
+        if status != "cancelled":
+            summary["total_orders"] += orders
+            summary["total_revenue"] += revenue
+    return summary
+
+def check(connection) -> list[str]:
+    """Расхождения сводки order_stats_total с пересчетом по orders"""
+    expected = {
+        status: (orders, revenue) for status, orders, revenue in connection.exec_driver_sql(
+            "SELECT COALESCE(status, ''), COUNT(*), COALESCE(SUM(total_amount), 0) FROM orders GROUP BY 1"
+        )
+    }
+    actual = {
+        status: (orders, revenue) for status, orders, revenue in connection.exec_driver_sql(
+            "SELECT status, orders, revenue FROM order_stats_total WHERE orders != 0"
+        )
+    }
+    problems = []
+    for status in expected.keys() | actual.keys():
+        want, got = expected.get(status, (0, 0)), actual.get(status, (0, 0))
+        if want[0] != got[0] or abs(want[1] - got[1]) > 0.01:
+            problems.append(f"{status or '<без статуса>'}: в orders {want}, в сводке {got}")
+    return problems
+
+def main():
+    import config
+    from database.migrations import migrate_sync_engine
+
+    engine = create_engine(config.DATABASE_URL.replace("sqlite+aiosqlite", "sqlite"))
+    migrate_sync_engine(engine)
+
+    if "--rebuild" in sys.argv:
+        with engine.begin() as conn:
+            rebuild(conn)
+        print("✅ Сводки заказов пересчитаны")
+
+    with engine.connect() as conn:
+        problems = check(conn)
+    if problems:
+        print("❌ Сводки расходятся с заказами (запустите с --rebuild):")
+        for problem in problems:
+            print(f"   • {problem}")
+        sys.exit(1)
+    print("✅ Сводки заказов сходятся с таблицей orders")
+
+if __name__ == "__main__":
+    main()
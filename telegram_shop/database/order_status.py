@@ -0,0 +1,72 @@
+"""
+Переходы статусов заказа и движение остатков
+
+Товар списывается со склада при оформлении заказа в боте, поэтому заказ держит товар
+в любом статусе, кроме отмененного. Изменение остатков считается по паре (старый статус,
+новый статус), а не по одному новому: повторная отмена или повторное завершение ничего не меняют.
+change_status() переводит сразу много заказов: по одному UPDATE orders на каждый старый статус
+и один UPDATE products на всю выборку вместо запроса на каждую позицию.
+Работает с sync Session: админ-панель вызывает напрямую, бот - через AsyncSession.run_sync.
+"""
+from sqlalchemy.orm import Session
+
+from database import queries
+
+# Куда можно перевести заказ из каждого статуса; выполненный и отмененный - конечные
+TRANSITIONS = {
+    "pending": ("confirmed", "completed", "cancelled"),
+    "confirmed": ("completed", "cancelled"),
+    "completed": (),
+    "cancelled": (),
+}
+
+HOLDS_STOCK = frozenset(("pending", "confirmed", "completed"))
+
+def stock_sign(old_status: str, new_status: str) -> int:
+    """1 - вернуть товар на склад, -1 - списать снова, 0 - остатки не меняются"""
+    return (old_status in HOLDS_STOCK) - (new_status in HOLDS_STOCK)
+
+def change_status(session: Session, order_ids, new_status: str) -> dict:
+    """
+    Переводит заказы в new_status и поправляет остатки в текущей транзакции (коммитит вызывающий)
+
+    Возвращает id по группам: changed - переведены, unchanged - уже были в этом статусе,
+    rejected - переход запрещен или статус успели сменить параллельно, missing - заказа нет.
+    ValueError - неизвестный статус.
+    """
+    if new_status not in TRANSITIONS:
+        raise ValueError(f"Неизвестный статус: {new_status}")
+
+    ids = list(dict.fromkeys(int(order_id) for order_id in order_ids))
+    result = {"changed": [], "unchanged": [], "rejected": [], "missing": []}
+    if not ids:
+        return result
+
+    current = dict(session.execute(queries.ORDER_STATUSES_BY_ID, {"ids": ids}).all())
+    by_status = {}
+    for order_id in ids:
+        if order_id not in current:
+            result["missing"].append(order_id)
+        elif current[order_id] == new_status:
+            result["unchanged"].append(order_id)
+        elif new_status not in TRANSITIONS.get(current[order_id], ()):
+            result["rejected"].append(order_id)
+        else:
+            by_status.setdefault(current[order_id], []).append(order_id)
+
+    stock_moves = {}
+    for old_status, group in by_status.items():
+        changed = set(session.scalars(
+            queries.UPDATE_ORDERS_STATUS, {"ids": group, "old_status": old_status, "new_status": new_status}
+        ))
+        result["changed"].extend(order_id for order_id in group if order_id in changed)
+        result["rejected"].extend(order_id for order_id in group if order_id not in changed)
+
+        sign = stock_sign(old_status, new_status)
+        if sign and changed:
+            stock_moves.setdefault(sign, []).extend(changed)
+
+    for sign, moved in stock_moves.items():
+        session.execute(queries.ADJUST_STOCK_FOR_ORDERS, {"ids": moved, "sign": sign})
+
+    return result
@@ -0,0 +1,367 @@
+"""
+Готовые запросы горячих путей бота
+
+Чтения для отрисовки выбирают только нужные колонки: строки упаковываются в кортежи
+из database.dto без ORM-объектов. Конструкции select/update/insert собираются один раз при импорте, а значения
+подставляются через bindparam при выполнении: session.execute(QUERY, {"user_id": ...}).
+Так обработчик не тратит время на построение выражения, а SQLAlchemy каждый раз
+находит скомпилированный SQL в своем кэше по одному и тому же объекту.
+INSERT строятся по таблицам (Model.__table__): ORM-insert со словарем параметров
+SQLAlchemy выполнял бы как массовую вставку объектов.
+Здесь же SQL горячих страниц админ-панели: database.migrations --check проверяет планы
+именно этих конструкций, а не их копий.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, insert, update, delete, bindparam, or_, func, cast, String, DateTime, Integer, text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from database.models import (
+    User, Product, Category, Brand, CartItem, Order, OrderItem, StockHold, OutboxMessage, OrderStatsDaily, OrderStatsTotal
+)
+
+# Пользователи
+
+USER_IDENTITY = select(
+    User.id, User.telegram_id, User.username, User.first_name, User.last_name
+).where(User.telegram_id == bindparam("telegram_id"))
+
+INSERT_USER = (
+    sqlite_insert(User.__table__)
+    .values(
+        telegram_id=bindparam("telegram_id"),
+        username=bindparam("username"),
+        first_name=bindparam("first_name"),
+        last_name=bindparam("last_name"),
+    )
+    .on_conflict_do_nothing(index_elements=["telegram_id"])
+)
+
+# NULL в параметре - поле не меняется, поэтому один запрос подходит для любого набора изменений.
+# В UPDATE имена параметров не должны совпадать с колонками таблицы, отсюда префикс new_
+UPDATE_USER_PROFILE = (
+    update(User)
+    .where(User.id == bindparam("user_id"))
+    .values(
+        username=func.coalesce(bindparam("new_username"), User.username),
+        first_name=func.coalesce(bindparam("new_first_name"), User.first_name),
+        last_name=func.coalesce(bindparam("new_last_name"), User.last_name),
+    )
+    .execution_options(synchronize_session=False)
+)
+
+# Каталог
+
+CATALOG_VERSION = text("SELECT version FROM catalog_version WHERE id = 1")
+
+ACTIVE_CATEGORIES = select(Category.id, Category.name).where(Category.is_active == True)
+
+BRANDS_IN_CATEGORY = (
+    select(Brand.id, Brand.name)
+    .join(Product, Brand.id == Product.brand_id)
+    .where(Product.category_id == bindparam("category_id"))
+    .where(Product.is_active == True)
+    .where(Brand.is_active == True)
+    .distinct()
+)
+
+PRODUCTS_IN_STOCK_BY_BRAND = (
+    select(Product.id, Product.name, Product.price, Product.quantity)
+    .where(Product.brand_id == bindparam("brand_id"))
+    .where(Product.is_active == True)
+    .where(Product.quantity > 0)
+    .order_by(Product.name)
+)
+
+# Снимок каталога в памяти бота (database.catalog): все активное одним проходом по каждой таблице
+SNAPSHOT_CATEGORIES = select(Category.id, Category.name).where(Category.is_active == True).order_by(Category.id)
+
+SNAPSHOT_BRANDS = select(Brand.id, Brand.name).where(Brand.is_active == True)
+
+SNAPSHOT_PRODUCTS = (
+    select(
+        Product.id, Product.name, Product.description, Product.price, Product.quantity,
+        Product.reserved_quantity, Product.brand_id, Product.category_id,
+    )
+    .where(Product.is_active == True)
+    .order_by(Product.brand_id, Product.name)
+)
+
+# Бренд и категория приходят тем же запросом, без отдельных selectinload
+PRODUCT_DETAIL = (
+    select(
+        Product.id, Product.name, Product.description, Product.price, Product.quantity,
+        Product.reserved_quantity, Product.is_active, Product.brand_id, Brand.name, Category.name,
+    )
+    .outerjoin(Brand, Brand.id == Product.brand_id)
+    .outerjoin(Category, Category.id == Product.category_id)
+    .where(Product.id == bindparam("product_id"))
+)
+
+# Корзина
+
+def _product_column(column):
+    """Коррелированный подзапрос к товару строки корзины"""
+    return select(column).where(Product.id == CartItem.product_id).correlate(CartItem).scalar_subquery()
+
+CART_LINE_COLUMNS = (
+    CartItem.id,
+    CartItem.product_id,
+    _product_column(Product.name),
+    _product_column(Product.price),
+    CartItem.quantity,
+    _product_column(Product.quantity),
+)
+
+CART_LINES = select(*CART_LINE_COLUMNS).where(CartItem.user_id == bindparam("user_id")).order_by(CartItem.id)
+
+_add_to_cart = sqlite_insert(CartItem.__table__).values(
+    user_id=bindparam("user_id"), product_id=bindparam("product_id"), quantity=bindparam("quantity")
+)
+ADD_TO_CART = _add_to_cart.on_conflict_do_update(
+    index_elements=["user_id", "product_id"],
+    set_={"quantity": CartItem.__table__.c.quantity + _add_to_cart.excluded.quantity}
+)
+
+# Изменения приходят одним JSON-объектом {"<id строки>": delta}, поэтому запрос один
+# для любого числа позиций. Переписываются только строки из deltas, у которых количество
+# действительно меняется; корзину целиком затем читает CART_LINES в той же транзакции
+_quantity_delta = func.coalesce(
+    func.json_extract(bindparam("deltas"), '$."' + cast(CartItem.id, String) + '"'), 0
+)
+_delta_keys = func.json_each(bindparam("deltas")).table_valued("key")
+_new_quantity = func.max(1, CartItem.quantity + _quantity_delta)
+CHANGE_CART_QUANTITIES = (
+    update(CartItem)
+    .where(CartItem.user_id == bindparam("cart_user_id"))
+    .where(CartItem.id.in_(select(cast(_delta_keys.c.key, Integer))))
+    .where(_new_quantity != CartItem.quantity)
+    .values(quantity=_new_quantity)
+    .execution_options(synchronize_session=False)
+)
+
+DELETE_CART = (
+    delete(CartItem)
+    .where(CartItem.user_id == bindparam("user_id"))
+    .execution_options(synchronize_session=False)
+)
+
+DELETE_CART_ITEM = (
+    delete(CartItem)
+    .where(CartItem.id == bindparam("cart_item_id"))
+    .where(CartItem.user_id == bindparam("user_id"))
+    .execution_options(synchronize_session=False)
+)
+
+# Резервы и оформление заказа
+
+_cart_quantity = (
+    select(CartItem.quantity)
+    .where(CartItem.user_id == bindparam("user_id"))
+    .where(CartItem.product_id == Product.id)
+    .correlate(Product)
+    .scalar_subquery()
+)
+_cart_product_ids = select(CartItem.product_id).where(CartItem.user_id == bindparam("user_id"))
+_enough_available = Product.quantity - Product.reserved_quantity >= _cart_quantity
+
+def _release_statements(condition):
+    """Возврат зарезервированного количества в товары и удаление резервов по условию на stock_holds"""
+    released = (
+        select(func.sum(StockHold.quantity))
+        .where(StockHold.product_id == Product.id)
+        .where(condition)
+        .correlate(Product)
+        .scalar_subquery()
+    )
+    return (
+        update(Product)
+        .where(Product.id.in_(select(StockHold.product_id).where(condition)))
+        .values(reserved_quantity=Product.reserved_quantity - released)
+        .execution_options(synchronize_session=False),
+        delete(StockHold).where(condition).execution_options(synchronize_session=False),
+    )
+
+_expired = StockHold.expires_at <= bindparam("now", type_=DateTime)
+
+RELEASE_EXPIRED = _release_statements(_expired)
+RELEASE_USER_HOLDS = _release_statements(StockHold.user_id == bindparam("user_id"))
+RELEASE_USER_AND_EXPIRED = _release_statements(or_(StockHold.user_id == bindparam("user_id"), _expired))
+
+RESERVE_CART_PRODUCTS = (
+    update(Product)
+    .where(Product.id.in_(_cart_product_ids))
+    .where(_enough_available)
+    .values(reserved_quantity=Product.reserved_quantity + _cart_quantity)
+    .returning(Product.id)
+    .execution_options(synchronize_session=False)
+)
+
+WRITE_OFF_CART_PRODUCTS = (
+    update(Product)
+    .where(Product.id.in_(_cart_product_ids))
+    .where(_enough_available)
+    .values(quantity=Product.quantity - _cart_quantity)
+    .returning(Product.id)
+    .execution_options(synchronize_session=False)
+)
+
+INSERT_CART_HOLDS = insert(StockHold.__table__).from_select(
+    ["user_id", "product_id", "quantity", "expires_at"],
+    select(CartItem.user_id, CartItem.product_id, CartItem.quantity, bindparam("expires_at", type_=DateTime))
+    .where(CartItem.user_id == bindparam("user_id"))
+)
+
+INSERT_ORDER_ITEMS_FROM_CART = insert(OrderItem.__table__).from_select(
+    ["order_id", "product_id", "product_name", "product_price", "quantity"],
+    select(bindparam("order_id"), Product.id, Product.name, Product.price, CartItem.quantity)
+    .join(Product, Product.id == CartItem.product_id)
+    .where(CartItem.user_id == bindparam("user_id"))
+)
+
+# Смена статуса заказов (database.order_status)
+
+ORDER_STATUSES_BY_ID = select(Order.id, Order.status).where(Order.id.in_(bindparam("ids", expanding=True)))
+
+# Условие на старый статус: заказ, который успели перевести параллельно, не попадет в RETURNING
+# и его остатки не тронем второй раз
+UPDATE_ORDERS_STATUS = (
+    update(Order)
+    .where(Order.id.in_(bindparam("ids", expanding=True)))
+    .where(Order.status == bindparam("old_status"))
+    .values(status=bindparam("new_status"))
+    .returning(Order.id)
+    .execution_options(synchronize_session=False)
+)
+
+# Позиции всех заказов складываются по товару: один UPDATE ... FROM на любую выборку заказов.
+# sign = 1 возвращает товар на склад, -1 списывает снова
+_order_items_by_product = (
+    select(OrderItem.product_id, func.sum(OrderItem.quantity).label("quantity"))
+    .where(OrderItem.order_id.in_(bindparam("ids", expanding=True)))
+    .group_by(OrderItem.product_id)
+    .subquery()
+)
+
+ADJUST_STOCK_FOR_ORDERS = (
+    update(Product)
+    .where(Product.id == _order_items_by_product.c.product_id)
+    .values(quantity=Product.quantity + bindparam("sign", type_=Integer) * _order_items_by_product.c.quantity)
+    .execution_options(synchronize_session=False)
+)
+
+# Outbox уведомлений
+
+OUTBOX_DUE = (
+    select(OutboxMessage)
+    .where(OutboxMessage.sent_at.is_(None))
+    .where(OutboxMessage.next_attempt_at <= bindparam("now", type_=DateTime))
+    .where(OutboxMessage.attempts < bindparam("max_attempts"))
+    .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+    .limit(bindparam("limit"))
+)
+
+OUTBOX_MARK_SENT = (
+    update(OutboxMessage)
+    .where(OutboxMessage.id.in_(bindparam("ids", expanding=True)))
+    .values(sent_at=bindparam("now", type_=DateTime), attempts=OutboxMessage.attempts + 1, last_error=None)
+    .execution_options(synchronize_session=False)
+)
+
+OUTBOX_MARK_FAILED = (
+    update(OutboxMessage)
+    .where(OutboxMessage.id.in_(bindparam("ids", expanding=True)))
+    .values(
+        attempts=OutboxMessage.attempts + 1,
+        next_attempt_at=bindparam("retry_at", type_=DateTime),
+        last_error=bindparam("error"),
+    )
+    .execution_options(synchronize_session=False)
+)
+
+# Уведомления, исчерпавшие попытки: в OUTBOX_DUE их уже нет, показываем в /metrics
+OUTBOX_DEAD_COUNT = (
+    select(func.count())
+    .select_from(OutboxMessage)
+    .where(OutboxMessage.sent_at.is_(None))
+    .where(OutboxMessage.attempts >= bindparam("max_attempts"))
+)
+
+OUTBOX_PRUNE_SENT = (
+    delete(OutboxMessage)
+    .where(OutboxMessage.sent_at.is_not(None))
+    .where(OutboxMessage.sent_at < bindparam("before", type_=DateTime))
+    .execution_options(synchronize_session=False)
+)
+
+# Сводки заказов (database.order_stats): несколько строк на статус вместо прохода по orders
+
+ORDER_STATS_TOTALS = select(OrderStatsTotal.status, OrderStatsTotal.orders, OrderStatsTotal.revenue)
+
+ORDER_STATS_SINCE = (
+    select(OrderStatsDaily.day, OrderStatsDaily.status, OrderStatsDaily.orders, OrderStatsDaily.revenue)
+    .where(OrderStatsDaily.day >= bindparam("since"))
+    .order_by(OrderStatsDaily.day)
+)
+
+# Админ-панель (sync Session): страница заказов, состав заказа, последние товары
+
+ADMIN_ORDER_ITEMS = text("""
+    SELECT oi.*, p.name as product_name, p.price as current_price
+    FROM order_items oi
+    LEFT JOIN products p ON oi.product_id = p.id
+    WHERE oi.order_id = :order_id
+""")
+
+ADMIN_LATEST_PRODUCTS = text("""
+    SELECT p.*, c.name as category_name, b.name as brand_name
+    FROM products p
+    LEFT JOIN categories c ON p.category_id = c.id
+    LEFT JOIN brands b ON p.brand_id = b.id
+    ORDER BY p.created_at DESC, p.id DESC LIMIT 10
+""")
+
+def admin_orders_page(filters: dict, after=None, limit: int = 50):
+    """SQL и параметры страницы заказов: фильтры из admin.app, after - ключ (created_at, id) последней строки
+
+    Вместо OFFSET продолжаем строго после ключа последней строки: SQLite идет по индексу
+    с нужного места, и глубина страницы не влияет на время ответа.
+    """
+    conditions = []
+    params = {"limit": limit}
+
+    if filters.get("status"):
+        conditions.append("o.status = :status")
+        params["status"] = filters["status"]
+    # created_at хранится строкой 'YYYY-MM-DD HH:MM:SS', поэтому даты сравниваются как строки
+    if filters.get("date_from"):
+        conditions.append("o.created_at >= :date_from")
+        params["date_from"] = filters["date_from"]
+    if filters.get("date_to"):
+        conditions.append("o.created_at < :date_to")
+        next_day = datetime.strptime(filters["date_to"], "%Y-%m-%d") + timedelta(days=1)
+        params["date_to"] = next_day.strftime("%Y-%m-%d")
+    if filters.get("customer"):
+        customer = filters["customer"].lstrip("@")
+        if customer.isdigit():
+            conditions.append("o.user_id IN (SELECT id FROM users WHERE telegram_id = :telegram_id)")
+            params["telegram_id"] = int(customer)
+        else:
+            conditions.append(
+                "(o.customer_name LIKE :customer OR u.username LIKE :customer "
+                "OR u.first_name LIKE :customer OR u.last_name LIKE :customer)"
+            )
+            params["customer"] = f"%{customer}%"
+    if after:
+        params["cursor_created_at"], params["cursor_id"] = after
+        conditions.append("(o.created_at, o.id) < (:cursor_created_at, :cursor_id)")
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return text(f"""
+        SELECT o.*, u.username, u.first_name, u.last_name, u.telegram_id
+        FROM orders o
+        LEFT JOIN users u ON o.user_id = u.id
+        {where}
+        ORDER BY o.created_at DESC, o.id DESC
+        LIMIT :limit
+    """), params
@@ -1,25 +1,88 @@
+import asyncio
+import json
+import weakref
+from datetime import datetime, timedelta
+from typing import Optional
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, and_
-from sqlalchemy.orm import selectinload  # 🆕 ДОБАВИТЬ ЭТОТ ИМПОРТ
-from database.models import User, Product, Category, Brand, CartItem, Order, OrderItem
+from sqlalchemy import select, update
+from database.models import Product, Category, Brand, CartItem, Order, OutboxMessage
+from database import queries, order_status
+from database.dto import UserIdentity, CartLine, ProductDetail
+from database.order_stats import summarize
+from utils.cache import TTLCache
+import config
+import pytz
+
+PROFILE_FIELDS = ("username", "first_name", "last_name")
+
+user_cache = TTLCache(maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL)
+# Одна загрузка на telegram_id при одновременных первых обращениях
+_user_locks = weakref.WeakValueDictionary()
+
+def _profile_changes(identity: UserIdentity, profile: dict) -> dict:
+    """Поля профиля, которые пришли из Telegram и отличаются от сохраненных"""
+    return {
+        field: value for field, value in profile.items()
+        if value is not None and getattr(identity, field) != value
+    }
 
 class UserRepository:
     @staticmethod
     async def get_or_create_user(session: AsyncSession, telegram_id: int, username: str = None,
-                               first_name: str = None, last_name: str = None) -> User:
-        user = await session.scalar(select(User).where(User.telegram_id == telegram_id))
-        if not user:
-            user = User(
-                telegram_id=telegram_id,
-                username=username,
-                first_name=first_name,
-                last_name=last_name
-            )
-            session.add(user)
+                               first_name: str = None, last_name: str = None) -> UserIdentity:
+        profile = {"username": username, "first_name": first_name, "last_name": last_name}
+
+        identity = user_cache.get(telegram_id)
+        if identity is not None and not _profile_changes(identity, profile):
+            return identity
+
+        lock = _user_locks.get(telegram_id)
+        if lock is None:
+            lock = _user_locks[telegram_id] = asyncio.Lock()
+
+        async with lock:
+            # Пока ждали блокировку, пользователя мог загрузить соседний апдейт
+            identity = user_cache.pop(telegram_id)
+            if identity is None:
+                identity = await UserRepository._load_or_insert(session, telegram_id, profile)
+
+            changes = _profile_changes(identity, profile)
+            if changes:
+                await session.execute(queries.UPDATE_USER_PROFILE, {
+                    "user_id": identity.id,
+                    **{f"new_{field}": changes.get(field) for field in PROFILE_FIELDS},
+                })
+                await session.commit()
+                identity = identity._replace(**changes)
+
+            user_cache.set(telegram_id, identity)
+            return identity
+
+    @staticmethod
+    async def _load_or_insert(session: AsyncSession, telegram_id: int, profile: dict) -> UserIdentity:
+        params = {"telegram_id": telegram_id}
+        row = (await session.execute(queries.USER_IDENTITY, params)).first()
+        if row is None:
+            # ON CONFLICT защищает от гонки с другим процессом, который создал пользователя первым
+            await session.execute(queries.INSERT_USER, {**params, **profile})
             await session.commit()
-        return user
+            row = (await session.execute(queries.USER_IDENTITY, params)).one()
+
+        return UserIdentity(*row)
+
+    @staticmethod
+    def cache_stats() -> dict:
+        """Счетчики кэша пользователей (размер, попадания, промахи, hit rate)"""
+        return user_cache.stats()
 
 class ProductRepository:
+    @staticmethod
+    async def get_product_detail(session: AsyncSession, product_id: int) -> Optional[ProductDetail]:
+        """Карточка товара с брендом и категорией одним запросом"""
+        row = (await session.execute(queries.PRODUCT_DETAIL, {"product_id": product_id})).first()
+        return ProductDetail(*row) if row is not None else None
+
     @staticmethod
     async def get_available_products(session: AsyncSession) -> list[Product]:
         result = await session.scalars(
@@ -50,18 +113,9 @@ class ProductRepository:
 class CartRepository:
     @staticmethod
     async def add_to_cart(session: AsyncSession, user_id: int, product_id: int, quantity: int = 1):
-        existing_item = await session.scalar(
-            select(CartItem)
-            .where(CartItem.user_id == user_id)
-            .where(CartItem.product_id == product_id)
+        await session.execute(
+            queries.ADD_TO_CART, {"user_id": user_id, "product_id": product_id, "quantity": quantity}
         )
-        
-        if existing_item:
-            existing_item.quantity += quantity
-        else:
-            cart_item = CartItem(user_id=user_id, product_id=product_id, quantity=quantity)
-            session.add(cart_item)
-        
         await session.commit()
 
     @staticmethod
@@ -75,7 +129,174 @@ class CartRepository:
         result = await session.execute(stmt)
         return result.scalars().all()
 
+    @staticmethod
+    async def get_cart_lines(session: AsyncSession, user_id: int) -> list[CartLine]:
+        """Корзина одним запросом, без загрузки ORM объектов"""
+        result = await session.execute(queries.CART_LINES, {"user_id": user_id})
+        return [CartLine(*row) for row in result]
+
+    @staticmethod
+    async def change_quantities(session: AsyncSession, user_id: int,
+                                deltas: dict[int, int]) -> list[CartLine]:
+        """Применяет суммарные изменения количества одним UPDATE и возвращает всю корзину
+
+        Количество не опускается ниже 1: лишние нажатия "➖" просто упираются в минимум.
+        UPDATE трогает только измененные строки, корзина читается в той же транзакции.
+        """
+        await session.execute(
+            queries.CHANGE_CART_QUANTITIES,
+            {"cart_user_id": user_id, "deltas": json.dumps({str(item_id): delta for item_id, delta in deltas.items()})}
+        )
+        result = await session.execute(queries.CART_LINES, {"user_id": user_id})
+        lines = [CartLine(*row) for row in result]
+        await session.commit()
+        return lines
+
+    @staticmethod
+    async def remove_item(session: AsyncSession, user_id: int, cart_item_id: int):
+        await session.execute(queries.DELETE_CART_ITEM, {"user_id": user_id, "cart_item_id": cart_item_id})
+        await session.commit()
+
+    @staticmethod
+    async def clear(session: AsyncSession, user_id: int, commit: bool = True):
+        await session.execute(queries.DELETE_CART, {"user_id": user_id})
+        if commit:
+            await session.commit()
+
+class InsufficientStockError(Exception):
+    """Товара на складе меньше, чем в корзине"""
+
+    def __init__(self, lines: list[CartLine]):
+        self.lines = lines
+        super().__init__(", ".join(line.name for line in lines))
+
+def _utcnow() -> datetime:
+    return datetime.now(pytz.utc)
+
+async def _apply_to_cart_products(session: AsyncSession, user_id: int, statement) -> Optional[list[CartLine]]:
+    """Выполняет UPDATE товаров корзины с условием наличия и возвращает строки корзины
+
+    Если условие выполнилось не для всех товаров, выбрасывает InsufficientStockError
+    со строками, которые не прошли (откатить транзакцию должен вызывающий).
+    Возвращает None, если корзина пуста.
+    """
+    result = await session.execute(statement, {"user_id": user_id})
+    updated = set(result.scalars().all())
+    lines = await CartRepository.get_cart_lines(session, user_id)
+
+    if not lines:
+        return None
+    short = [line for line in lines if line.product_id not in updated]
+    if short:
+        raise InsufficientStockError(short)
+    return lines
+
+class ReservationRepository:
+    """Резервы товара на время оформления: доступно = quantity - reserved_quantity"""
+
+    @staticmethod
+    async def _release(session: AsyncSession, statements: tuple, params: dict) -> int:
+        """Возвращает зарезервированное количество в товары и удаляет резервы (запросы из queries.RELEASE_*)"""
+        update_products, delete_holds = statements
+        await session.execute(update_products, params)
+        result = await session.execute(delete_holds, params)
+        return result.rowcount
+
+    @staticmethod
+    async def release_expired(session: AsyncSession, commit: bool = True) -> int:
+        """Снимает просроченные резервы (поиск по индексу expires_at)"""
+        released = await ReservationRepository._release(session, queries.RELEASE_EXPIRED, {"now": _utcnow()})
+        if commit:
+            await session.commit()
+        return released
+
+    @staticmethod
+    async def release_user_holds(session: AsyncSession, user_id: int, commit: bool = True) -> int:
+        """Снимает резервы пользователя (отмена оформления)"""
+        released = await ReservationRepository._release(
+            session, queries.RELEASE_USER_HOLDS, {"user_id": user_id}
+        )
+        if commit:
+            await session.commit()
+        return released
+
+    @staticmethod
+    async def hold_cart(session: AsyncSession, user_id: int,
+                        ttl_seconds: int = None) -> Optional[list[CartLine]]:
+        """Резервирует всю корзину на время оформления одной транзакцией
+
+        Старые резервы пользователя заменяются новыми. Если доступного товара
+        не хватает, ничего не резервируется и выбрасывается InsufficientStockError.
+        """
+        ttl_seconds = ttl_seconds or config.RESERVATION_TTL_SECONDS
+
+        try:
+            await ReservationRepository._release(
+                session, queries.RELEASE_USER_AND_EXPIRED, {"user_id": user_id, "now": _utcnow()}
+            )
+            lines = await _apply_to_cart_products(session, user_id, queries.RESERVE_CART_PRODUCTS)
+        except InsufficientStockError:
+            await session.rollback()
+            raise
+
+        if lines is None:
+            await session.commit()
+            return None
+
+        expires_at = _utcnow() + timedelta(seconds=ttl_seconds)
+        await session.execute(queries.INSERT_CART_HOLDS, {"user_id": user_id, "expires_at": expires_at})
+        await session.commit()
+        return lines
+
 class OrderRepository:
+    @staticmethod
+    async def create_order_from_cart(session: AsyncSession, user_id: int, order_data: dict,
+                                     commit: bool = True) -> Optional[tuple[Order, list[CartLine]]]:
+        """Оформляет корзину в заказ одной транзакцией фиксированного числа запросов
+
+        Собственные резервы пользователя переходят в продажу, списание остатков,
+        позиции заказа и очистка корзины выполняются набором, а не построчно.
+        Если доступного товара не хватает, транзакция откатывается и выбрасывается
+        InsufficientStockError. Возвращает None, если корзина пуста.
+        С commit=False транзакция остается открытой, чтобы дописать в нее outbox.
+        """
+        # Первый же запрос - запись: SQLite сразу берет блокировку на запись.
+        # Свои резервы снимаем в этой же транзакции, поэтому их никто не успеет занять
+        try:
+            await ReservationRepository._release(
+                session, queries.RELEASE_USER_AND_EXPIRED, {"user_id": user_id, "now": _utcnow()}
+            )
+            lines = await _apply_to_cart_products(session, user_id, queries.WRITE_OFF_CART_PRODUCTS)
+        except InsufficientStockError:
+            await session.rollback()
+            raise
+
+        if lines is None:
+            await session.rollback()
+            return None
+
+        order = Order(
+            user_id=user_id,
+            total_amount=sum(line.price * line.quantity for line in lines),
+            customer_name=order_data['customer_name'],
+            delivery_method=order_data['delivery_method'],
+            delivery_address=order_data['delivery_address'],
+            delivery_date=order_data['delivery_date'],
+            delivery_time=order_data['delivery_time'],
+            payment_method=order_data['payment_method'],
+            notes=order_data.get('notes', ''),
+            status='pending'
+        )
+        session.add(order)
+        await session.flush()
+
+        await session.execute(queries.INSERT_ORDER_ITEMS_FROM_CART, {"order_id": order.id, "user_id": user_id})
+        await session.execute(queries.DELETE_CART, {"user_id": user_id})
+        if commit:
+            await session.commit()
+
+        return order, lines
+
     @staticmethod
     async def get_orders(session: AsyncSession, status: str = None) -> list[Order]:
         query = select(Order).join(Order.user)
@@ -85,8 +306,75 @@ class OrderRepository:
         return result.all()
 
     @staticmethod
-    async def update_order_status(session: AsyncSession, order_id: int, new_status: str):
-        order = await session.get(Order, order_id)
-        if order:
-            order.status = new_status
-            await session.commit()
\ No newline at end of file
+    async def update_order_status(session: AsyncSession, order_id: int, new_status: str) -> dict:
+        """Тот же переход статуса с поправкой остатков, что и в админ-панели"""
+        result = await session.run_sync(order_status.change_status, [order_id], new_status)
+        await session.commit()
+        return result
+
+class OutboxRepository:
+    """Очередь исходящих уведомлений: запись вместе с событием, отправка фоновой задачей"""
+
+    @staticmethod
+    def enqueue(session: AsyncSession, chat_id: int, text: str):
+        """Добавляет уведомление в текущую транзакцию (коммитит вызывающий)"""
+        session.add(OutboxMessage(chat_id=chat_id, text=text))
+
+    @staticmethod
+    async def fetch_due(session: AsyncSession, limit: int, max_attempts: int) -> list[OutboxMessage]:
+        result = await session.scalars(
+            queries.OUTBOX_DUE, {"now": _utcnow(), "max_attempts": max_attempts, "limit": limit}
+        )
+        return result.all()
+
+    @staticmethod
+    async def has_backlog(session: AsyncSession, max_attempts: int) -> bool:
+        """Ждет ли отправки больше одного уведомления"""
+        return len(await OutboxRepository.fetch_due(session, 2, max_attempts)) > 1
+
+    @staticmethod
+    async def count_dead(session: AsyncSession, max_attempts: int) -> int:
+        """Неотправленные уведомления, которые больше не будут повторяться"""
+        return await session.scalar(queries.OUTBOX_DEAD_COUNT, {"max_attempts": max_attempts})
+
+    @staticmethod
+    async def prune_sent(session: AsyncSession, days: int) -> int:
+        """Удаляет уведомления, отправленные раньше чем days дней назад"""
+        result = await session.execute(queries.OUTBOX_PRUNE_SENT, {"before": _utcnow() - timedelta(days=days)})
+        await session.commit()
+        return result.rowcount
+
+    @staticmethod
+    async def mark_sent(session: AsyncSession, ids: list[int]):
+        await session.execute(queries.OUTBOX_MARK_SENT, {"ids": ids, "now": _utcnow()})
+        await session.commit()
+
+    @staticmethod
+    async def mark_failed(session: AsyncSession, ids: list[int], error: str, retry_in: float):
+        await session.execute(
+            queries.OUTBOX_MARK_FAILED,
+            {"ids": ids, "error": error, "retry_at": _utcnow() + timedelta(seconds=retry_in)}
+        )
+        await session.commit()
+
+class OrderStatsRepository:
+    """Статистика заказов из сводок, которые ведут триггеры на orders"""
+
+    @staticmethod
+    async def get_summary(session: AsyncSession, days: int = 7) -> dict:
+        """Итоги за все время, за сегодня (UTC) и выручка по дням за последние days дней"""
+        today = _utcnow().date()
+        since = (today - timedelta(days=days - 1)).isoformat()
+
+        summary = summarize((await session.execute(queries.ORDER_STATS_TOTALS)).all())
+        rows = (await session.execute(queries.ORDER_STATS_SINCE, {"since": since})).all()
+        summary["today"] = summarize(
+            (status, orders, revenue) for day, status, orders, revenue in rows if day == today.isoformat()
+        )
+        by_day = {}
+        for day, status, orders, revenue in rows:
+            if status != "cancelled":
+                day_orders, day_revenue = by_day.get(day, (0, 0.0))
+                by_day[day] = (day_orders + orders, day_revenue + revenue)
+        summary["days"] = sorted(by_day.items())
+        return summary
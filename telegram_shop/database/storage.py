@@ -0,0 +1,73 @@
+"""Профили хранилища SQLite: PRAGMA для каждого нового соединения и параметры пула"""
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+import config
+
+PROFILES = ("default", "tuned")
+
+def get_pragmas(profile: str = None) -> dict:
+    """PRAGMA, которые применяются к каждому соединению выбранного профиля"""
+    profile = profile or config.DB_PROFILE
+    if profile not in PROFILES:
+        raise ValueError(f"Неизвестный профиль хранилища: {profile}")
+
+    if profile == "default":
+        return {}
+
+    return {
+        "journal_mode": "WAL",
+        "synchronous": config.SQLITE_SYNCHRONOUS,
+        "busy_timeout": config.SQLITE_BUSY_TIMEOUT_MS,
+        # Отрицательное значение - размер кэша в килобайтах, а не в страницах
+        "cache_size": -config.SQLITE_CACHE_SIZE_KB,
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        "temp_store": config.SQLITE_TEMP_STORE,
+    }
+
+def get_engine_options(url: str, profile: str = None, pool_size: int = None) -> dict:
+    """Параметры create_engine/create_async_engine для профиля"""
+    options = {"echo": config.DB_ECHO}
+
+    # Для SQLite в памяти пул фиксированный, размер пула к нему не применяется
+    if make_url(url).database not in (None, "", ":memory:"):
+        options.update(
+            pool_size=pool_size or config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+        )
+
+    if (profile or config.DB_PROFILE) == "tuned":
+        # busy_timeout выставляется через PRAGMA, драйверный timeout не должен его перекрывать
+        options["connect_args"] = {"timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000}
+
+    return options
+
+def apply_storage_profile(engine, profile: str = None):
+    """Регистрирует установку PRAGMA на каждое новое соединение (sync или async движок)"""
+    pragmas = get_pragmas(profile)
+    if not pragmas:
+        return engine
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name} = {value}")
+        finally:
+            cursor.close()
+
+    return engine
+
+def build_sync_engine(url: str = None, profile: str = None, pool_size: int = None):
+    """Sync движок (админ-панель, CLI) с теми же PRAGMA, что у бота
+
+    Бот и админ-панель работают с одним файлом: в WAL читатели не ждут писателя,
+    а busy_timeout заставляет запись подождать блокировку вместо мгновенной ошибки.
+    """
+    url = (url or config.DATABASE_URL).replace("sqlite+aiosqlite", "sqlite")
+    engine = create_engine(url, **get_engine_options(url, profile, pool_size))
+    return apply_storage_profile(engine, profile)
@@ -0,0 +1,70 @@
+"""
+Счетчики строк таблиц для страницы /database админ-панели
+
+COUNT(*) в SQLite - проход по таблице (или самому узкому индексу), поэтому число строк
+хранится в table_counters: триггеры на INSERT/DELETE поправляют его в той же транзакции.
+reconcile() пересчитывает счетчики по таблицам: первичное заполнение и периодическая сверка
+на случай записей в обход триггеров (например, INSERT OR REPLACE без recursive_triggers).
+Запуск: python -m database.table_counters [--reconcile]
+"""
+import sys
+
+from sqlalchemy import create_engine
+
+COUNTED_TABLES = ("products", "categories", "brands", "users", "orders", "order_items")
+
+def _counter_triggers() -> list[str]:
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{operation.lower()}_counter "
+        f"AFTER {operation} ON {table} "
+        f"BEGIN UPDATE table_counters SET row_count = row_count {sign} 1 WHERE table_name = '{table}'; END"
+        for table in COUNTED_TABLES
+        for operation, sign in (("INSERT", "+"), ("DELETE", "-"))
+    ]
+
+COUNTER_TRIGGERS = _counter_triggers()
+
+def reconcile(connection) -> dict:
+    """Пересчитывает счетчики (sync Connection) и возвращает расхождения {таблица: (было, стало)}
+
+    Пересчет каждой таблицы - один оператор: SQLite выполняет его атомарно, поэтому вставка
+    из другого процесса не может вклиниться между COUNT(*) и записью счетчика.
+    """
+    stored = dict(connection.exec_driver_sql("SELECT table_name, row_count FROM table_counters").all())
+    drift = {}
+    for table in COUNTED_TABLES:
+        # WHERE true нужен SQLite, чтобы отличить ON CONFLICT от продолжения SELECT
+        row = connection.exec_driver_sql(
+            f"INSERT INTO table_counters (table_name, row_count) SELECT '{table}', COUNT(*) FROM {table} WHERE true "
+            "ON CONFLICT (table_name) DO UPDATE SET row_count = excluded.row_count "
+            "WHERE row_count != excluded.row_count "
+            "RETURNING row_count"
+        ).first()
+        if row is not None:
+            drift[table] = (stored.get(table), row.row_count)
+    return drift
+
+def main():
+    import config
+    from database.migrations import migrate_sync_engine
+
+    engine = create_engine(config.DATABASE_URL.replace("sqlite+aiosqlite", "sqlite"))
+    migrate_sync_engine(engine)
+
+    with engine.connect() as conn:
+        drift = reconcile(conn)
+        # Без --reconcile только показываем расхождения
+        if "--reconcile" in sys.argv:
+            conn.commit()
+        else:
+            conn.rollback()
+
+    for table, (stored, actual) in drift.items():
+        print(f"⚠️ {table}: в счетчике {stored}, в таблице {actual}")
+    if drift and "--reconcile" not in sys.argv:
+        print("❌ Счетчики расходятся с таблицами (запустите с --reconcile)")
+        sys.exit(1)
+    print("✅ Счетчики строк сходятся с таблицами" if not drift else "✅ Счетчики пересчитаны")
+
+if __name__ == "__main__":
+    main()
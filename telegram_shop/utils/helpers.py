@@ -4,20 +4,20 @@ from database.models import Product
 async def check_product_availability(session: AsyncSession, product_id: int, quantity: int = 1) -> bool:
     """Проверяет доступно ли достаточное количество товара"""
     product = await session.get(Product, product_id)
-    return product and product.quantity >= quantity and product.is_active
+    return bool(product and product.is_active and await get_available_quantity(product) >= quantity)
 
-async def get_product_status_text(product: Product) -> str:
-    """Возвращает текст статуса товара"""
+async def get_product_status_text(product) -> str:
+    """Возвращает текст статуса товара (Product или ProductDetail)"""
+    available = await get_available_quantity(product)
     if not product.is_active:
         return "❌ Не доступен"
-    elif product.quantity == 0:
+    elif available == 0:
         return "📦 Закончился"
-    elif product.quantity <= 5:
-        return f"⚠️ Осталось мало ({product.quantity} шт)"
+    elif available <= 5:
+        return f"⚠️ Осталось мало ({available} шт)"
     else:
-        return f"✅ В наличии ({product.quantity} шт)"
+        return f"✅ В наличии ({available} шт)"
 
-# 🆕 ИСПРАВЛЕННАЯ ФУНКЦИЯ (без reserved_quantity)
-async def get_available_quantity(product: Product) -> int:
-    """Возвращает доступное количество товара"""
-    return max(0, product.quantity)
\ No newline at end of file
+async def get_available_quantity(product) -> int:
+    """Возвращает доступное количество товара (без резервов оформляемых заказов)"""
+    return max(0, (product.quantity or 0) - (product.reserved_quantity or 0))
\ No newline at end of file
@@ -9,6 +9,7 @@ class OrderStates(StatesGroup):
     checkout_delivery_method = State()
     checkout_date = State()
     checkout_payment = State()
+    checkout_confirm = State()
 
 class AdminStates(StatesGroup):
     add_product = State()